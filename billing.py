@@ -10,6 +10,8 @@ Optional (Windows printing):
     pip install pywin32
 Optional for image preview:
     pip install pillow
+Optional for faster PDF reading/merging:
+    pip install pymupdf
 """
 
 import tkinter as tk
@@ -18,6 +20,7 @@ from datetime import datetime
 import os
 import sys
 import tempfile
+import io
 import json
 import sqlite3
 import threading
@@ -26,32 +29,41 @@ import csv
 import logging
 import zipfile
 import shutil
-
-from openpyxl import Workbook, load_workbook
+import subprocess
+import bisect
+import re
+import textwrap
+import hashlib
+import hmac
+import atexit
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from operator import itemgetter
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+# openpyxl, reportlab, PyPDF2, PyMuPDF and Pillow are imported where they are
+# first used so that launching the app only pays for tkinter.
 
 # win32print used for printer enumeration & printing on Windows (optional)
-try:
-    import win32print
-except Exception:
-    win32print = None
-
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib import colors
-from PyPDF2 import PdfReader, PdfWriter
+win32print = None
+if sys.platform.startswith("win"):
+    try:
+        import win32print
+    except Exception:
+        win32print = None
 
-# Optional Pillow for image thumbnail preview (not required)
+# Optional orjson for the settings blob (falls back to compact stdlib json)
 try:
-    from PIL import Image, ImageTk
+    import orjson
 except Exception:
-    Image = None
-    ImageTk = None
+    orjson = None
 
 # ------------------- Configuration -------------------
 PRODUCT_FILE = "product_master.xlsx"
 BILLS_FILE = "bills.xlsx"
 CUSTOMER_FILE = "customers.xlsx"
+CUSTOMER_CSV = "customers.csv"
 BILL_COUNTER_FILE = "bill_counter.txt"
 PDF_FOLDER = "bills_pdf"
 DB_FILE = "billing_app.db"
@@ -66,68 +78,294 @@ SHOP_PHONE = "04447791355 / 9944369227"
 DEFAULT_LOW_STOCK_THRESHOLD = 100
 DEFAULT_GST_PERCENT = 18.0
 
+# wraps preview lines for the printed PDF; keeps column spacing intact
+PRINT_WRAP_WIDTH = 110
+_PRINT_WRAPPER = textwrap.TextWrapper(width=PRINT_WRAP_WIDTH, break_long_words=True, break_on_hyphens=False,
+                                      drop_whitespace=False, replace_whitespace=False, expand_tabs=False)
+
+# rendered print PDFs kept for reprints of an unchanged preview
+PRINT_PDF_CACHE_SIZE = 8
+# delay before an evicted temp print PDF is deleted
+PRINT_TMP_GRACE_MS = 30_000
+# delay before a failed bill counter write is tried again
+BILL_COUNTER_RETRY_MS = 5000
+# temp print PDFs are named billing_print_*.pdf so leftovers can be swept
+PRINT_TMP_PREFIX = "billing_print_"
+# decoded product image previews kept for re-selection
+THUMB_CACHE_SIZE = 64
+# seconds a cached product image mtime is trusted before it is stat'ed again
+IMAGE_STAT_TTL = 2.0
+# buffer for copying attached images (shutil's default is 64 KiB)
+COPY_BUFSIZE = 1024 * 1024
+# keysyms that never change the item-name text
+SUGGEST_IGNORED_KEYS = frozenset((
+    "Up", "Down", "Left", "Right", "Home", "End", "Prior", "Next", "Return", "Escape", "Tab",
+    "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R", "Caps_Lock",
+    "Super_L", "Super_R", "Meta_L", "Meta_R",
+))
+# pages extracted for the "Read PDF" viewer
+READ_PDF_PREVIEW_PAGES = 5
+# raw text printing (opt-in): ESC @ resets ESC/POS printers before the receipt
+RAW_PRINT_INIT = b"\x1b@"
+RAW_PRINT_ENCODING = "cp437"
+# PDFs read ahead of the zip writer during backup
+BACKUP_READAHEAD = 8
+
+# text receipt (Print tab preview): fixed header, per-bill heading, one line per item, footer
+RECEIPT_HEADER = f"{SHOP_NAME}\n{SHOP_ADDRESS}\n{SHOP_PHONE}\n" + "=" * 60 + "\n"
+RECEIPT_BILL_FMT = ("Bill No: {bill_no:<10} Date: {date}\n" + "=" * 60 + "\n"
+                    + f"{'Item':20}{'MRP':>6}{'Rate':>7}{'Disc%':>7}{'Qty':>6}{'Total':>9}\n" + "-" * 60 + "\n")
+# field names match the bill item dicts, so rows format straight from them
+ROW_FMT = "{name:20.20}{mrp:>6.2f}{rate:>7.2f}{discount:>7.2f}{qty:>6}{total:>9.2f}\n"
+RECEIPT_FOOTER_FMT = ("-" * 60 + "\nSubTotal: {sub_total:.2f}\nGST: {gst:.2f}\nTotal: {total:.2f}\n"
+                      "Paid: {paid:.2f}  Due: {due:.2f}\n" + "=" * 60 + "\n")
+
+# saved-PDF bill table layout (fixed, so ReportLab never has to measure cells)
+BILL_TABLE_COL_WIDTHS = [200, 50, 50, 50, 40, 60]
+BILL_TABLE_ROW_HEIGHT = 18
+
+# seconds a printer enumeration stays valid for Print-tab switches
+PRINTER_CACHE_TTL = 30
+
+# write buffer for multi-page outputs (merged PDFs, CSV exports)
+BIG_BUF = 1 << 17
+
 # ------------------- Logging -------------------
 logging.basicConfig(filename=LOG_FILE, level=logging.INFO,
                     format="%(asctime)s %(levelname)s: %(message)s")
 
 # ------------------- Helpers -------------------
+_fitz = False  # not probed yet
+
+def get_fitz():
+    """Return the PyMuPDF module, or None if it is not installed."""
+    global _fitz
+    if _fitz is False:
+        try:
+            import fitz as _fitz
+        except Exception:
+            _fitz = None
+    return _fitz
+
+_pil = False  # not probed yet
+
+def get_pil():
+    """Return Pillow's (Image, ImageTk), or None if Pillow is not installed."""
+    global _pil
+    if _pil is False:
+        try:
+            from PIL import Image, ImageTk
+            _pil = (Image, ImageTk)
+        except Exception:
+            _pil = None
+    return _pil
+
+_ready_folders = set()
+
 def ensure_pdf_folder(folder=PDF_FOLDER):
-    if not os.path.exists(folder):
-        os.makedirs(folder)
+    # created at most once per process
+    if folder not in _ready_folders:
+        os.makedirs(folder, exist_ok=True)
+        _ready_folders.add(folder)
     return folder
 
-def get_next_bill_no():
-    """Read bill counter file, increment, save and return (string, int)."""
-    if os.path.exists(BILL_COUNTER_FILE):
+def read_bill_counter():
+    """Return the last used bill number from the counter file (0 if missing)."""
+    try:
         with open(BILL_COUNTER_FILE, "r") as f:
+            return int(f.read().strip())
+    except:
+        return 0
+
+def write_bill_counter(last_no):
+    """Overwrite the counter file with last_no (tiny file, unbuffered write)."""
+    fd = os.open(BILL_COUNTER_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, str(last_no).encode("ascii"))
+    finally:
+        os.close(fd)
+
+def enumerate_printers():
+    """Return (printer names, default printer) from win32print, if available."""
+    printers = []
+    default_printer = None
+    if win32print:
+        try:
+            # Level 4 returns names straight from the registry; the default level 1
+            # (and level 2) can open each connected printer over RPC
+            raw = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS, None, 4)
+            for p in raw:
+                try:
+                    pname = p["pPrinterName"]
+                except:
+                    pname = str(p)
+                printers.append(pname)
             try:
-                last_no = int(f.read().strip())
+                default_printer = win32print.GetDefaultPrinter()
             except:
-                last_no = 0
-    else:
-        last_no = 0
-    next_no = last_no + 1
-    with open(BILL_COUNTER_FILE, "w") as f:
-        f.write(str(next_no))
-    return f"BILL-{next_no:06d}", next_no
+                default_printer = None
+        except:
+            printers = []
+            default_printer = None
+    if not printers:
+        if default_printer:
+            printers = [default_printer]
+        else:
+            printers = ["<No printers found>"]
+    return printers, default_printer
+
+def remove_quietly(path):
+    """Delete path, ignoring a missing file or one still locked by a reader."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def copy_file(src, dest, bufsize=COPY_BUFSIZE):
+    """Copy src to dest through a large buffer; no-op when both are the same file."""
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        return
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        shutil.copyfileobj(fsrc, fdst, bufsize)
 
-def get_next_pdf_filename():
+def sweep_print_tmp(min_age=PRINT_TMP_GRACE_MS / 1000):
+    """Delete temp print PDFs left by earlier sessions (older than min_age seconds)."""
+    cutoff = time.time() - min_age
+    try:
+        with os.scandir(tempfile.gettempdir()) as it:
+            for e in it:
+                if e.name.startswith(PRINT_TMP_PREFIX) and e.name.endswith(".pdf"):
+                    try:
+                        if e.stat().st_mtime < cutoff:
+                            remove_quietly(e.path)
+                    except OSError:
+                        pass
+    except OSError:
+        pass
+
+def entry_number(entry, kind=float):
+    """Parse an Entry's text with kind (one Tcl read); blank means 0."""
+    s = entry.get().strip()
+    return kind(s) if s else kind()
+
+def iter_lines(s):
+    """Yield the lines of s (like str.splitlines on '\n') without building a list."""
+    i = 0
+    n = len(s)
+    while i < n:
+        j = s.find("\n", i)
+        if j < 0:
+            yield s[i:]
+            return
+        yield s[i:j]
+        i = j + 1
+
+_reportlab_warm = False
+
+def warm_reportlab():
+    """Import ReportLab and load the fonts the bill PDFs use into its global cache."""
+    global _reportlab_warm
+    if _reportlab_warm:
+        return
+    _reportlab_warm = True
+    try:
+        from reportlab.pdfgen import canvas  # noqa: F401
+        from reportlab.pdfbase import pdfmetrics
+        for name in ("Helvetica", "Helvetica-Bold", "Courier"):
+            pdfmetrics.getFont(name)
+    except Exception:
+        logging.exception("ReportLab warm-up failed")
+
+_bill_table_style = None
+
+def get_bill_table_style():
+    """Build the saved-PDF TableStyle once and share it across bills."""
+    global _bill_table_style
+    if _bill_table_style is None:
+        from reportlab.platypus import TableStyle
+        from reportlab.lib import colors
+        _bill_table_style = TableStyle([("GRID",(0,0),(-1,-1),0.5,colors.black),
+                                        ("FONT",(0,0),(-1,0),"Helvetica-Bold")])
+    return _bill_table_style
+
+def scan_pdf_max():
+    """Return the highest numeric NNN.pdf index in PDF_FOLDER (0 if none)."""
     ensure_pdf_folder()
-    existing = [f for f in os.listdir(PDF_FOLDER) if f.endswith(".pdf")]
-    if not existing:
-        return os.path.join(PDF_FOLDER, "001.pdf")
     numbers = []
-    for f in existing:
-        name, _ = os.path.splitext(f)
-        if name.isdigit():
-            numbers.append(int(name))
-    next_num = max(numbers) + 1 if numbers else 1
-    return os.path.join(PDF_FOLDER, f"{next_num:03d}.pdf")
-
-def read_pdf(file_path):
+    with os.scandir(PDF_FOLDER) as it:
+        for e in it:
+            name = e.name
+            if name.endswith(".pdf") and name[:-4].isdigit() and e.is_file():
+                numbers.append(int(name[:-4]))
+    return max(numbers) if numbers else 0
+
+def read_pdf(file_path, max_pages=None):
+    """Return the text of the first max_pages pages (all pages if None)."""
     if not os.path.exists(file_path):
         messagebox.showerror("Error", f"{file_path} does not exist")
         return ""
+    fitz = get_fitz()
+    if fitz:
+        doc = fitz.open(file_path)
+        try:
+            return "".join(page.get_text() + "\n" for page in islice(doc, max_pages))
+        finally:
+            doc.close()
+    from PyPDF2 import PdfReader
     reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
+    parts = []
+    for page in islice(reader.pages, max_pages):
         try:
             page_text = page.extract_text()
         except Exception:
             page_text = None
         if page_text:
-            text += page_text + "\n"
-    return text
+            parts.append(page_text)
+    return "".join(p + "\n" for p in parts)
+
+def pdf_page_count(file_path):
+    """Return the number of pages in file_path, or None if it can't be read."""
+    try:
+        fitz = get_fitz()
+        if fitz:
+            doc = fitz.open(file_path)
+            try:
+                return len(doc)
+            finally:
+                doc.close()
+        from PyPDF2 import PdfReader
+        return len(PdfReader(file_path).pages)
+    except Exception:
+        return None
 
 def merge_pdfs(pdf_list, output_file):
+    fitz = get_fitz()
+    if fitz:
+        out = fitz.open()
+        try:
+            for pdf_path in pdf_list:
+                if not os.path.exists(pdf_path):
+                    continue
+                with fitz.open(pdf_path) as src:
+                    out.insert_pdf(src)
+            out.save(output_file, deflate=True, garbage=3)
+        finally:
+            out.close()
+        messagebox.showinfo("Success", f"Merged PDFs saved as {output_file}")
+        return
+    from PyPDF2 import PdfReader, PdfWriter
     writer = PdfWriter()
     for pdf_path in pdf_list:
         if not os.path.exists(pdf_path):
             continue
+        if hasattr(writer, "append"):
+            # PyPDF2 >= 3 copies the whole document in one call
+            writer.append(pdf_path)
+            continue
         reader = PdfReader(pdf_path)
         for page in reader.pages:
             writer.add_page(page)
-    with open(output_file, "wb") as f:
+    with open(output_file, "wb", buffering=BIG_BUF) as f:
         writer.write(f)
     messagebox.showinfo("Success", f"Merged PDFs saved as {output_file}")
 
@@ -175,10 +413,78 @@ THEME_ORDER = ["Light", "Dark", "Warm"]
 # ------------------- DB Schema & Utilities -------------------
 DB_SCHEMA_VERSION = 1
 
+# per-connection tuning; journal_mode=WAL is persistent and set once in init_db
+DB_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA mmap_size=268435456",
+)
+
+def connect_db(db_file=DB_FILE, **kwargs):
+    """Open a sqlite connection with the app's PRAGMAs applied."""
+    # connections are long-lived; keep every hot statement compiled (default is 128)
+    kwargs.setdefault("cached_statements", 512)
+    conn = sqlite3.connect(db_file, **kwargs)
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+# guards the app's shared connection (the CSV import runs on a worker thread)
+DB_LOCK = threading.RLock()
+
+# per-thread cache of open connections, keyed by db file
+_thread_conns = threading.local()
+
+def get_conn(db_file=DB_FILE):
+    """Return this thread's connection to db_file, opening it on first use."""
+    conns = getattr(_thread_conns, "conns", None)
+    if conns is None:
+        conns = _thread_conns.conns = {}
+    conn = conns.get(db_file)
+    if conn is None:
+        conn = conns[db_file] = connect_db(db_file)
+    return conn
+
+def close_thread_conns():
+    for conn in getattr(_thread_conns, "conns", {}).values():
+        try:
+            conn.close()
+        except:
+            pass
+    _thread_conns.conns = {}
+
+# connections of worker threads go with their thread-local; the main thread's close here
+atexit.register(close_thread_conns)
+
+@contextmanager
+def use_db(conn=None, db_file=DB_FILE):
+    """Yield the shared conn under DB_LOCK, or this thread's cached connection."""
+    if conn is not None:
+        with DB_LOCK:
+            try:
+                yield conn
+            except:
+                # the shared conn lives for the session; a failed write must not
+                # leave it inside a transaction
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+        return
+    conn = get_conn(db_file)
+    try:
+        yield conn
+    except:
+        # the connection outlives this call; don't leave a half-done transaction on it
+        conn.rollback()
+        raise
+
 def init_db(db_file=DB_FILE):
     """Initialize sqlite DB with tables for products, bills, and settings."""
-    conn = sqlite3.connect(db_file)
+    conn = connect_db(db_file)
     cur = conn.cursor()
+    # WAL: one log append per commit and readers don't block the writer
+    cur.execute("PRAGMA journal_mode=WAL")
     # products
     cur.execute("""
     CREATE TABLE IF NOT EXISTS products (
@@ -250,81 +556,117 @@ def init_db(db_file=DB_FILE):
         v TEXT
     )
     """)
+    # indexes for the bill join/lookups and product filters
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bill_items_bill_id ON bill_items(bill_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bills_bill_no ON bills(bill_no)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bills_date ON bills(date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products(category)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_products_sku ON products(sku)")
     # store schema version
     cur.execute("INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)", ("schema_version", str(DB_SCHEMA_VERSION)))
     conn.commit()
     conn.close()
 
-def save_product_to_db(p, db_file=DB_FILE):
+def max_saved_bill_no(db_file=DB_FILE, conn=None):
+    """Return the highest N of the BILL-N numbers stored in bills (0 if none)."""
+    try:
+        with use_db(conn, db_file) as conn:
+            r = conn.execute("SELECT MAX(CAST(substr(bill_no, 6) AS INTEGER)) FROM bills "
+                             "WHERE bill_no LIKE 'BILL-%'").fetchone()
+        return int(r[0] or 0)
+    except Exception:
+        return 0
+
+def read_meta_int(key, db_file=DB_FILE, conn=None):
+    """Return meta[key] as an int, or None if it is missing or unreadable."""
+    try:
+        with use_db(conn, db_file) as conn:
+            r = conn.execute("SELECT v FROM meta WHERE k=?", (key,)).fetchone()
+        return int(r[0]) if r else None
+    except Exception:
+        return None
+
+def write_meta(key, value, db_file=DB_FILE, conn=None):
+    with use_db(conn, db_file) as conn:
+        conn.execute("INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)", (key, str(value)))
+        conn.commit()
+
+def save_product_to_db(p, db_file=DB_FILE, conn=None):
     """Insert or update a product dict into DB."""
-    conn = sqlite3.connect(db_file)
-    cur = conn.cursor()
-    # try update by name, else insert
-    cur.execute("SELECT id FROM products WHERE name=?", (p.get("name"),))
-    r = cur.fetchone()
-    if r:
-        pid = r[0]
-        cur.execute("""UPDATE products SET sku=?, category=?, brand=?, size=?, color=?, hsn=?, mrp=?, rate=?, wholesale=?, super_wholesale=?,
-                       discount=?, qty=?, image_path=?, notes=? WHERE id=?""",
-                    (p.get("sku"), p.get("category"), p.get("brand"), p.get("size"), p.get("color"), p.get("hsn"),
-                     p.get("mrp"), p.get("rate"), p.get("wholesale"), p.get("super_wholesale"), p.get("discount"),
-                     p.get("qty"), p.get("image_path"), p.get("notes"), pid))
-    else:
-        cur.execute("""INSERT INTO products (sku,name,category,brand,size,color,hsn,mrp,rate,wholesale,super_wholesale,discount,qty,image_path,notes)
-                       VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-                    (p.get("sku"), p.get("name"), p.get("category"), p.get("brand"), p.get("size"), p.get("color"),
-                     p.get("hsn"), p.get("mrp"), p.get("rate"), p.get("wholesale"), p.get("super_wholesale"),
-                     p.get("discount"), p.get("qty"), p.get("image_path"), p.get("notes")))
-    conn.commit()
-    conn.close()
+    with use_db(conn, db_file) as conn:
+        _save_product(conn, p)
 
-def delete_product_from_db(name, db_file=DB_FILE):
-    conn = sqlite3.connect(db_file)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM products WHERE name=?", (name,))
+def _save_product(conn, p):
+    # update by name, else insert: one cached upsert instead of SELECT + UPDATE/INSERT
+    conn.execute(_PRODUCT_UPSERT, tuple(p.get(c) for c in PRODUCT_COLUMNS))
     conn.commit()
-    conn.close()
 
-def load_products_from_db(db_file=DB_FILE):
-    conn = sqlite3.connect(db_file)
-    cur = conn.cursor()
-    cur.execute("SELECT sku,name,category,brand,size,color,hsn,mrp,rate,wholesale,super_wholesale,discount,qty,image_path,notes FROM products")
-    rows = cur.fetchall()
-    conn.close()
-    products = {}
-    for r in rows:
-        products[str(r[1]).lower()] = {
-            "sku": r[0],
-            "name": r[1],
-            "category": r[2],
-            "brand": r[3],
-            "size": r[4],
-            "color": r[5],
-            "hsn": r[6],
-            "mrp": r[7] or 0,
-            "rate": r[8] or 0,
-            "wholesale": r[9] or 0,
-            "super_wholesale": r[10] or 0,
-            "discount": r[11] or 0,
-            "qty": r[12] or 0,
-            "image_path": r[13],
-            "notes": r[14]
-        }
-    return products
+PRODUCT_COLUMNS = ("sku", "name", "category", "brand", "size", "color", "hsn", "mrp", "rate", "wholesale",
+                   "super_wholesale", "discount", "qty", "image_path", "notes")
+# (field, label) pairs for the add/edit product forms
+PRODUCT_FORM_LABELS = tuple((f, f.capitalize() + ":") for f in PRODUCT_COLUMNS)
+_PRODUCT_UPSERT = (
+    f"INSERT INTO products ({','.join(PRODUCT_COLUMNS)}) VALUES ({','.join('?' * len(PRODUCT_COLUMNS))}) "
+    "ON CONFLICT(name) DO UPDATE SET "
+    + ", ".join(f"{c}=excluded.{c}" for c in PRODUCT_COLUMNS if c != "name")
+)
+
+_PRODUCT_SELECT = (
+    "SELECT sku, name, category, brand, size, color, hsn, COALESCE(mrp,0) mrp, COALESCE(rate,0) rate, "
+    "COALESCE(wholesale,0) wholesale, COALESCE(super_wholesale,0) super_wholesale, COALESCE(discount,0) discount, "
+    "COALESCE(qty,0) qty, image_path, notes FROM products"
+)
+
+def save_products_to_db(products, db_file=DB_FILE, conn=None):
+    """Insert or update many product dicts in one transaction (upsert on name)."""
+    with use_db(conn, db_file) as conn:
+        with conn:
+            conn.executemany(_PRODUCT_UPSERT, (tuple(p.get(c) for c in PRODUCT_COLUMNS) for p in products))
+        # refresh planner stats after a bulk load
+        conn.execute("ANALYZE products")
+        conn.commit()
+
+def delete_product_from_db(name, db_file=DB_FILE, conn=None):
+    with use_db(conn, db_file) as conn:
+        conn.execute("DELETE FROM products WHERE name=?", (name,))
+        conn.commit()
+
+def load_products_from_db(db_file=DB_FILE, conn=None):
+    with use_db(conn, db_file) as conn:
+        # row_factory on the cursor only, so the shared connection keeps plain tuples;
+        # null numerics are coerced in SQL so rows map straight onto product dicts
+        cur = conn.cursor()
+        cur.row_factory = sqlite3.Row
+        return {str(r["name"]).lower(): dict(r) for r in cur.execute(_PRODUCT_SELECT)}
+
+def _product_index_row(key, p):
+    """(key, name, brand, category, product) with the search fields lowercased."""
+    return (key, (p.get("name") or key).lower(), (p.get("brand") or "").lower(), (p.get("category") or "").lower(), p)
+
+def _row_trigrams(row):
+    grams = set()
+    for field in row[1:4]:
+        grams.update(field[j:j+3] for j in range(len(field) - 2))
+    return grams
 
 # ------------------- Undo/Redo -------------------
+# snapshots keep bill items as plain tuples in this field order
+ITEM_FIELDS = ("name", "mrp", "rate", "discount", "qty", "total")
+_item_tuple = itemgetter(*ITEM_FIELDS)
+
 class UndoRedoStack:
+    """Undo history of immutable snapshots (stored as-is, no copy or serialization)."""
     def __init__(self, maxlen=200):
-        self.stack = []
+        # bounded deque evicts the oldest snapshot on append
+        self.stack = deque(maxlen=maxlen)
         self.index = -1
         self.maxlen = maxlen
 
     def push(self, snapshot):
-        if self.index < len(self.stack) - 1:
-            self.stack = self.stack[:self.index+1]
-        self.stack.append(json.dumps(snapshot, default=str))
-        if len(self.stack) > self.maxlen:
-            self.stack.pop(0)
+        # drop the redo tail in place (only the discarded entries are touched)
+        while len(self.stack) > self.index + 1:
+            self.stack.pop()
+        self.stack.append(snapshot)
         self.index = len(self.stack) - 1
 
     def can_undo(self):
@@ -337,16 +679,16 @@ class UndoRedoStack:
         if not self.can_undo():
             return None
         self.index -= 1
-        return json.loads(self.stack[self.index])
+        return self.stack[self.index]
 
     def redo(self):
         if not self.can_redo():
             return None
         self.index += 1
-        return json.loads(self.stack[self.index])
+        return self.stack[self.index]
 
 # ------------------- CSV Import / Export for products -------------------
-def import_products_csv(file_path, db_file=DB_FILE):
+def import_products_csv(file_path, db_file=DB_FILE, conn=None):
     products = {}
     with open(file_path, newline='', encoding='utf-8') as f:
         reader = csv.DictReader(f)
@@ -385,42 +727,145 @@ def import_products_csv(file_path, db_file=DB_FILE):
                 "image_path": r.get("image_path"),
                 "notes": r.get("notes")
             }
-            save_product_to_db(p, db_file=db_file)
             products[name.lower()] = p
+    # one transaction for the whole file instead of a connect + commit per row
+    save_products_to_db(products.values(), db_file=db_file, conn=conn)
     return products
 
 def export_products_csv(out_file, products):
-    with open(out_file, "w", newline='', encoding='utf-8') as f:
+    with open(out_file, "w", newline='', encoding='utf-8', buffering=BIG_BUF) as f:
         w = csv.writer(f)
         w.writerow(["name", "sku", "category", "brand", "size", "color", "hsn", "mrp", "rate", "wholesale", "super_wholesale", "discount", "qty", "image_path", "notes"])
-        for name, p in products.items():
-            w.writerow([p.get("name") or name, p.get("sku"), p.get("category"), p.get("brand"), p.get("size"), p.get("color"), p.get("hsn"), p.get("mrp"), p.get("rate"), p.get("wholesale"), p.get("super_wholesale"), p.get("discount"), p.get("qty"), p.get("image_path"), p.get("notes")])
+        # writerows drives the loop from C
+        w.writerows((p.get("name") or name, p.get("sku"), p.get("category"), p.get("brand"), p.get("size"), p.get("color"), p.get("hsn"), p.get("mrp"), p.get("rate"), p.get("wholesale"), p.get("super_wholesale"), p.get("discount"), p.get("qty"), p.get("image_path"), p.get("notes"))
+                    for name, p in products.items())
+    return out_file
+
+# ------------------- Customers -------------------
+# customers are appended to CUSTOMER_CSV (one small write per save);
+# CUSTOMER_FILE is only rebuilt from it on explicit export
+def _seed_customer_csv():
+    """Create CUSTOMER_CSV, carrying over the rows of a legacy customers.xlsx."""
+    rows = []
+    if os.path.exists(CUSTOMER_FILE):
+        from openpyxl import load_workbook
+        wb = load_workbook(CUSTOMER_FILE, read_only=True, data_only=True)
+        try:
+            rows = [r for r in wb.active.iter_rows(values_only=True) if r and any(r)]
+        finally:
+            wb.close()
+    with open(CUSTOMER_CSV, "w", newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+def append_customer(name, phone):
+    if not os.path.exists(CUSTOMER_CSV):
+        _seed_customer_csv()
+    with open(CUSTOMER_CSV, "a", newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow([name, phone, str(datetime.now())])
+
+def export_customers_xlsx(out_file=CUSTOMER_FILE):
+    from openpyxl import Workbook
+    if not os.path.exists(CUSTOMER_CSV):
+        _seed_customer_csv()
+    # write_only streams rows to disk instead of building the sheet in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    with open(CUSTOMER_CSV, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            ws.append(row)
+    wb.save(out_file)
     return out_file
 
 # ------------------- Backup / Restore -------------------
-def backup_project(backup_path=None):
+def _backup_files():
+    # DB_FILE is not listed: recent commits may still sit in its -wal, so backup_project
+    # adds a consistent snapshot of it instead
+    for fn in (PRODUCT_FILE, BILLS_FILE, CUSTOMER_FILE, CUSTOMER_CSV, BILL_COUNTER_FILE, LOG_FILE, SETTINGS_FILE):
+        if os.path.exists(fn):
+            yield fn
+    if os.path.isdir(PDF_FOLDER):
+        with os.scandir(PDF_FOLDER) as it:
+            for e in it:
+                if e.is_file():
+                    yield e.path
+
+def _snapshot_db(conn=None, db_file=DB_FILE):
+    """Copy the live DB (WAL contents included) into a temp file and return its path."""
+    fd, tmp = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    dst = sqlite3.connect(tmp)
+    try:
+        with use_db(conn, db_file) as src:
+            src.backup(dst)
+    finally:
+        dst.close()
+    return tmp
+
+def backup_project(backup_path=None, conn=None):
     if not backup_path:
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = f"billing_backup_{ts}.zip"
-    files_to_add = []
-    for fn in (PRODUCT_FILE, BILLS_FILE, CUSTOMER_FILE, BILL_COUNTER_FILE, DB_FILE, LOG_FILE, SETTINGS_FILE):
-        if os.path.exists(fn):
-            files_to_add.append(fn)
-    if os.path.isdir(PDF_FOLDER):
-        for pdf in os.listdir(PDF_FOLDER):
-            files_to_add.append(os.path.join(PDF_FOLDER, pdf))
-    with zipfile.ZipFile(backup_path, "w", zipfile.ZIP_DEFLATED) as z:
-        for f in files_to_add:
+    pdfs = []
+    # level 1: xlsx are zip containers already and the db gains little from higher levels
+    with zipfile.ZipFile(backup_path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+        if os.path.exists(DB_FILE):
+            snap = None
+            try:
+                snap = _snapshot_db(conn)
+                z.write(snap, DB_FILE)
+            except Exception:
+                logging.exception(f"Failed to add {DB_FILE} to backup")
+            finally:
+                if snap:
+                    remove_quietly(snap)
+        for f in _backup_files():
+            if f.lower().endswith(".pdf"):
+                pdfs.append(f)
+                continue
             try:
                 z.write(f, os.path.basename(f))
             except Exception:
                 logging.exception(f"Failed to add {f} to backup")
+        # PDF streams are already Flate-compressed, so they are stored as-is and the
+        # time goes to reading them: workers read ahead while this thread writes
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            for f, fut in _read_ahead(ex, pdfs):
+                try:
+                    zi = zipfile.ZipInfo.from_file(f, os.path.basename(f))
+                    zi.compress_type = zipfile.ZIP_STORED
+                    z.writestr(zi, fut.result())
+                except Exception:
+                    logging.exception(f"Failed to add {f} to backup")
     return backup_path
 
-def restore_project_from_zip(zip_path):
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def _read_ahead(executor, paths, depth=BACKUP_READAHEAD):
+    """Yield (path, future of its bytes) in order, keeping at most depth reads in flight."""
+    it = iter(paths)
+    pending = deque((p, executor.submit(_read_bytes, p)) for p in islice(it, depth))
+    while pending:
+        item = pending.popleft()
+        nxt = next(it, None)
+        if nxt is not None:
+            pending.append((nxt, executor.submit(_read_bytes, nxt)))
+        yield item
+
+def restore_project_from_zip(zip_path, conn=None):
+    """Extract a backup over the working files. conn (and this thread's cached
+    connections) are closed first; the caller must reopen the DB afterwards."""
     if not os.path.exists(zip_path):
         raise FileNotFoundError(zip_path)
     with zipfile.ZipFile(zip_path, "r") as z:
+        if DB_FILE in z.namelist():
+            if conn is not None:
+                conn.close()
+            close_thread_conns()
+            # a leftover -wal/-shm would be replayed over the restored file
+            remove_quietly(DB_FILE + "-wal")
+            remove_quietly(DB_FILE + "-shm")
         z.extractall(".")
     return True
 
@@ -430,41 +875,45 @@ DEFAULT_SETTINGS = {
     "auto_backup_interval_minutes": 60,
     "recent_files": [],
     "last_theme": "Light",
-    "page_size": 200
+    "page_size": 200,
+    "raw_print": False
 }
 
-def load_settings():
+def load_settings(conn=None):
+    # the DB is the source of truth; settings.json is only read as a legacy fallback
+    try:
+        with use_db(conn) as conn:
+            r = conn.execute("SELECT value FROM settings WHERE key=?", ("app_settings",)).fetchone()
+        if r:
+            return json.loads(r[0])
+    except:
+        pass
     if os.path.exists(SETTINGS_FILE):
         try:
             with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
                 return json.load(f)
         except:
             pass
-    # try DB fallback
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        cur.execute("SELECT value FROM settings WHERE key=?", ("app_settings",))
-        r = cur.fetchone()
-        conn.close()
-        if r:
-            return json.loads(r[0])
-    except:
-        pass
     return DEFAULT_SETTINGS.copy()
 
-def save_settings(settings):
-    with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-        json.dump(settings, f, indent=2)
-    # save to DB as well
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        cur.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", ("app_settings", json.dumps(settings)))
+def dumps_compact(obj):
+    """Serialize obj to compact JSON text (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"))
+
+def save_settings(settings, conn=None):
+    # single upsert: one WAL append, no JSON file rewrite
+    with use_db(conn) as conn:
+        conn.execute("INSERT INTO settings (key, value) VALUES ('app_settings', ?) "
+                     "ON CONFLICT(key) DO UPDATE SET value=excluded.value", (dumps_compact(settings),))
         conn.commit()
-        conn.close()
-    except:
-        pass
+
+def export_settings(settings, path=SETTINGS_FILE):
+    """Write settings to a JSON file (explicit user export only)."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+    return path
 
 # ------------------- Progress UI (for heavy imports) -------------------
 class ProgressWindow:
@@ -510,20 +959,68 @@ class BillingApp:
         self.total = 0.0
         self.paid_amount = tk.DoubleVar(value=0.0)
         self.due_amount = tk.DoubleVar(value=0.0)
+        # plain-float mirrors of the Tk vars for the totals/preview hot paths
+        self._cache_var(self.gst_percent, "_gst")
+        self._cache_var(self.paid_amount, "_paid")
         self.low_stock_threshold = DEFAULT_LOW_STOCK_THRESHOLD
+        # printer enumeration cache: (printers, default) and monotonic timestamp
+        self._printers_cache = None
+        self._printers_ts = 0
+        self._printers_loading = False
+        # blake2b(preview text) -> temp PDF path, most recent last
+        self._print_pdf_cache = OrderedDict()
+        # temp PDF path -> monotonic time it was last handed to the printer/viewer
+        self._print_pdf_sent = {}
+        # files still in use when the last session closed are only removed now
+        threading.Thread(target=sweep_print_tmp, daemon=True).start()
+        # (string, int) number of the bill on screen once it has been printed or
+        # saved; shared by preview, print and save until clear_all/new_client
+        self._pending_bill_no = None
         # products loaded from DB or xlsx
         try:
             init_db()
         except:
             pass
+        # one connection for the app lifetime; helpers borrow it via conn=self.db
+        self.db = connect_db(DB_FILE, check_same_thread=False)
+        self.settings = load_settings(conn=self.db)
+        # bill counter lives in the meta table (counter file is the legacy fallback)
+        # and is written through on every allocation; never start below a number
+        # already saved in bills
+        bill_no = read_meta_int("bill_counter", conn=self.db)
+        self._bill_no = max(read_bill_counter() if bill_no is None else bill_no,
+                            max_saved_bill_no(conn=self.db))
+        self._bill_no_dirty = False
+        # highest NNN.pdf index; without a stored counter the folder is scanned once, on first save
+        self._pdf_max = read_meta_int("pdf_counter", conn=self.db)
         try:
-            self.products = load_products_from_db()
+            self.products = load_products_from_db(conn=self.db)
         except:
             self.products = {}
+        self._product_keys_sorted = []
+        self._product_keys_concat = ""
+        self._suggest_job = None
+        self._prod_search_job = None
+        # image path -> (mtime or None if missing, monotonic time checked); see IMAGE_STAT_TTL
+        self._image_mtime = {}
+        # (image path, mtime) -> PhotoImage thumbnail, most recent last
+        self._thumb_cache = OrderedDict()
+        self._last_q = None
+        self._last_suggestions = ()
+        # category names for the filter combobox; re-queried only when marked dirty
+        self._categories_cache = ()
+        self._categories_dirty = True
+        self._categories_loading = False
+        self._index_products()
         self.items_in_bill = []
+        self._row_seq = 0  # iid source for bill tree rows
+        # one-shot retry of a failed bill counter write (the counter is otherwise
+        # written through in consume_bill_no; bills themselves are never timer-saved)
+        self._counter_retry_job = None
 
         # Theme
         self.current_theme_name = "Light"
+        self._applied_theme = None
         self.current_theme = THEMES[self.current_theme_name]
 
         # Style
@@ -548,13 +1045,13 @@ class BillingApp:
         self.root.bind("<Control-S>", lambda e: self.save_customer())  # Ctrl+Shift+S
         self.root.bind("<Control-Up>", lambda e: self.move_item_up())
         self.root.bind("<Control-Down>", lambda e: self.move_item_down())
-        self.root.bind("<F5>", lambda e: self.refresh_printer_list())
+        self.root.bind("<F5>", lambda e: self.refresh_printer_list(force=True))
         self.root.bind("<F9>", lambda e: self.reload_products())
         self.root.bind("<Alt-t>", lambda e: self.cycle_theme())
         self.root.bind("<Control-l>", lambda e: self.threshold_entry.focus_set())
         self.root.bind("<Control-i>", lambda e: self.item_name.focus_set())
         self.root.bind("<Control-b>", lambda e: self.bill_preview.focus_set())
-        self.root.bind("<Control-r>", lambda e: self.update_totals())
+        self.root.bind("<Control-r>", lambda e: self.update_totals(recalc=True))
         self.root.bind("<Control-m>", lambda e: self.open_merge_pdf())
         self.root.bind("<Control-h>", lambda e: self.show_shortcuts_help())
 
@@ -563,19 +1060,82 @@ class BillingApp:
         self._push_snapshot = lambda: self._ur_stack.push(self._snapshot())
         self._push_snapshot()
 
-        # Auto-save stub
-        self.auto_save_interval = 5000
-        self.root.after(self.auto_save_interval, self.auto_save_bill)
+        # flush pending writes before the window goes away, and on any other
+        # interpreter exit (Ctrl+C, sys.exit from a callback)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        atexit.register(self._flush_pending)
+
+    def _cache_var(self, var, attr):
+        """Keep self.<attr> equal to var.get(), updated by a write trace."""
+        def sync(*_):
+            try:
+                setattr(self, attr, var.get())
+            except tk.TclError:
+                # a cleared entry means 0; half-typed text ("-", "1e") keeps the last valid value
+                if not str(tk.Variable.get(var)).strip():
+                    setattr(self, attr, 0.0)
+        setattr(self, attr, var.get())
+        var.trace_add("write", sync)
+
+    # ------- Bill counter -------
+    def peek_bill_no(self):
+        """Return the bill number the next consume_bill_no() will hand out."""
+        return f"BILL-{self._bill_no + 1:06d}"
+
+    def current_bill_no(self):
+        """Return the (string, int) number of the bill on screen, consuming one the first time."""
+        if self._pending_bill_no is None:
+            self._pending_bill_no = self.consume_bill_no()
+        return self._pending_bill_no
+
+    def consume_bill_no(self):
+        """Increment the in-memory bill counter and return (string, int)."""
+        self._bill_no += 1
+        self._bill_no_dirty = True
+        # written through like pdf_counter: a crash right after a bill must not
+        # hand the same number out again
+        self._write_bill_counter()
+        if self._bill_no_dirty:
+            self._schedule_counter_retry()  # both stores failed; try again shortly
+        return f"BILL-{self._bill_no:06d}", self._bill_no
+
+    def get_next_pdf_filename(self):
+        if self._pdf_max is None:
+            self._pdf_max = scan_pdf_max()
+        else:
+            ensure_pdf_folder()
+        self._pdf_max += 1
+        # written through, so a crash before the next flush can't hand out a used name
+        try:
+            write_meta("pdf_counter", self._pdf_max, conn=self.db)
+        except Exception:
+            logging.exception("Failed to store pdf counter")
+        return os.path.join(PDF_FOLDER, f"{self._pdf_max:03d}.pdf")
+
+    def _write_bill_counter(self):
+        if not self._bill_no_dirty:
+            return
+        try:
+            write_meta("bill_counter", self._bill_no, conn=self.db)
+        except Exception:
+            logging.exception("Failed to store bill counter, using counter file")
+            try:
+                write_bill_counter(self._bill_no)
+            except Exception:
+                logging.exception("Failed to write bill counter")
+                return
+        self._bill_no_dirty = False
 
     # ------- Snapshot for undo/redo -------
     def _snapshot(self):
-        return {
-            "items": list(self.items_in_bill),
-            "cust_name": self.cust_name.get() if hasattr(self, "cust_name") else "",
-            "cust_phone": self.cust_phone.get() if hasattr(self, "cust_phone") else "",
-            "paid": self.paid_amount.get(),
-            "gst": self.gst_percent.get()
-        }
+        """Return (items as ITEM_FIELDS tuples, cust_name, cust_phone, paid, gst)."""
+        return (
+            tuple(map(_item_tuple, self.items_in_bill)),
+            self.cust_name.get() if hasattr(self, "cust_name") else "",
+            self.cust_phone.get() if hasattr(self, "cust_phone") else "",
+            self._paid,
+            self._gst,
+        )
 
     # ---------------- UI build ----------------
     def build_ui(self):
@@ -621,6 +1181,7 @@ class BillingApp:
         self.cust_phone = tk.Entry(cust_frame, width=20)
         self.cust_phone.grid(row=0, column=3, padx=6)
         ttk.Button(cust_frame, text="Save Customer", command=self.save_customer).grid(row=0, column=4, padx=12)
+        ttk.Button(cust_frame, text="Export Customers (XLSX)", command=self.export_customers_ui).grid(row=0, column=5, padx=4)
 
     def build_item_frame(self):
         item_frame = tk.LabelFrame(self.main_frame, text="Add Item", padx=10, pady=10)
@@ -631,7 +1192,7 @@ class BillingApp:
         self.item_name.bind("<KeyRelease>", self.show_suggestions)
         self.item_name.bind("<Down>", self.move_down)
         self.item_name.bind("<Up>", self.move_up)
-        self.item_name.bind("<Escape>", lambda e: self.suggestion_box.grid_remove())
+        self.item_name.bind("<Escape>", lambda e: (self._cancel_suggest(), self._hide_suggestions()))
         self.item_name.bind("<Return>", self.enter_in_item_name)
 
         self.suggestion_box = tk.Listbox(item_frame, height=6)
@@ -690,8 +1251,8 @@ class BillingApp:
         ttk.Button(tool_frame, text="Redo (Ctrl+Y)", command=lambda: getattr(self, "redo", lambda: None)()).pack(side="left", padx=4)
         ttk.Button(tool_frame, text="Import Products CSV", command=self.import_products_ui).pack(side="left", padx=4)
         ttk.Button(tool_frame, text="Export Products CSV", command=self.export_products_ui).pack(side="left", padx=4)
-        ttk.Button(tool_frame, text="Backup Now", command=lambda: messagebox.showinfo("Backup", f"Backup created: {backup_project()}")).pack(side="left", padx=4)
-        ttk.Button(tool_frame, text="Preferences", command=lambda: open_preferences_dialog(self.root, load_settings())).pack(side="left", padx=4)
+        ttk.Button(tool_frame, text="Backup Now", command=lambda: messagebox.showinfo("Backup", f"Backup created: {backup_project(conn=self.db)}")).pack(side="left", padx=4)
+        ttk.Button(tool_frame, text="Preferences", command=lambda: open_preferences_dialog(self.root, load_settings(conn=self.db), conn=self.db, on_saved=self._apply_settings)).pack(side="left", padx=4)
 
     def build_treeview(self):
         columns = ("Item","MRP","Rate","Discount","Qty","Total")
@@ -734,7 +1295,7 @@ class BillingApp:
         self.printer_var = tk.StringVar()
         self.printer_combo = ttk.Combobox(printer_frame, textvariable=self.printer_var, state="readonly", width=60)
         self.printer_combo.pack(side="left", padx=(0,6))
-        ttk.Button(printer_frame, text="Refresh Printers (F5)", command=self.refresh_printer_list).pack(side="left", padx=(6,0))
+        ttk.Button(printer_frame, text="Refresh Printers (F5)", command=lambda: self.refresh_printer_list(force=True)).pack(side="left", padx=(6,0))
         btn_frame = tk.Frame(self.print_frame)
         btn_frame.pack(pady=(0,10))
         ttk.Button(btn_frame, text="Print", command=self.print_bill_to_printer).pack(side="left", padx=6)
@@ -745,6 +1306,10 @@ class BillingApp:
     def apply_theme(self, theme_name):
         if theme_name not in THEMES:
             return
+        # re-selecting the active theme would repeat every configure call for nothing
+        if theme_name == self._applied_theme:
+            return
+        self._applied_theme = theme_name
         self.current_theme_name = theme_name
         self.current_theme = THEMES[theme_name]
         t = self.current_theme
@@ -801,12 +1366,8 @@ class BillingApp:
             self.theme_var.set(self.current_theme_name)
         except:
             pass
-        self.refresh_tree()
-        # also adjust product tab tree if exists
-        try:
-            self.refresh_products_view()
-        except:
-            pass
+        # row colours follow the tag_configure calls above; no tree rebuild needed
+        # (the products tree has no theme-dependent rows either)
 
     def cycle_theme(self):
         idx = THEME_ORDER.index(self.current_theme_name)
@@ -817,30 +1378,26 @@ class BillingApp:
         self.apply_theme(selected)
 
     # ---------------- Printers ----------------
-    def refresh_printer_list(self):
-        printers = []
-        default_printer = None
-        if win32print:
+    def refresh_printer_list(self, force=False):
+        """Populate the printer combobox; EnumPrinters runs off the UI thread."""
+        if not force and self._printers_cache is not None and time.monotonic() - self._printers_ts < PRINTER_CACHE_TTL:
+            return
+        if self._printers_loading:
+            return
+        self._printers_loading = True
+        def task():
             try:
-                raw = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS)
-                for p in raw:
-                    try:
-                        pname = p[2]
-                    except:
-                        pname = str(p)
-                    printers.append(pname)
-                try:
-                    default_printer = win32print.GetDefaultPrinter()
-                except:
-                    default_printer = None
-            except:
-                printers = []
-                default_printer = None
-        if not printers:
-            if default_printer:
-                printers = [default_printer]
-            else:
-                printers = ["<No printers found>"]
+                result = enumerate_printers()
+            except Exception:
+                logging.exception("Printer enumeration failed")
+                result = (["<No printers found>"], None)
+            self.root.after(0, lambda: self._apply_printer_list(*result))
+        threading.Thread(target=task, daemon=True).start()
+
+    def _apply_printer_list(self, printers, default_printer):
+        self._printers_loading = False
+        self._printers_cache = (printers, default_printer)
+        self._printers_ts = time.monotonic()
         try:
             self.printer_combo["values"] = printers
             if default_printer and default_printer in printers:
@@ -853,37 +1410,136 @@ class BillingApp:
     # ---------------- Products / Suggestions ----------------
     def reload_products(self):
         try:
-            p = load_products_from_db()
+            p = load_products_from_db(conn=self.db)
             if p:
                 self.products = p
             else:
                 # fallback to excel
                 if os.path.exists(PRODUCT_FILE):
-                    wb = load_workbook(PRODUCT_FILE)
-                    ws = wb.active
-                    for row in ws.iter_rows(min_row=2, values_only=True):
-                        if row and row[0]:
-                            self.products[str(row[0]).lower()] = {"name":row[0],"mrp":row[1] or 0,"rate":row[2] or 0,"discount":row[3] or 0,"qty":row[4] if len(row)>4 else 0}
+                    from openpyxl import load_workbook
+                    # read_only streams rows instead of building the full workbook tree
+                    wb = load_workbook(PRODUCT_FILE, read_only=True, data_only=True)
+                    try:
+                        ws = wb.active
+                        for row in ws.iter_rows(min_row=2, values_only=True):
+                            if row and row[0]:
+                                self.products[str(row[0]).lower()] = {"name":row[0],"mrp":row[1] or 0,"rate":row[2] or 0,"discount":row[3] or 0,"qty":row[4] if len(row)>4 else 0}
+                    finally:
+                        wb.close()
         except Exception:
             logging.exception("Failed to reload products")
+        self._index_products()
         messagebox.showinfo("Products Reloaded", f"Loaded {len(self.products)} products")
         self.refresh_products_view()
 
+    def _index_products(self):
+        """Rebuild the sorted key list and search indexes from self.products."""
+        self._product_keys_sorted = sorted(self.products)
+        # newline-joined keys for the substring fallback; rebuilt lazily after edits
+        self._product_keys_concat = None
+        # pre-lowered search fields for the products tab filter, in key order:
+        # (key, name, brand, category, product)
+        products = self.products
+        self._prod_index = [_product_index_row(k, products[k]) for k in self._product_keys_sorted]
+        self._prod_rows_by_key = {row[0]: row for row in self._prod_index}
+        # trigram -> keys whose name/brand/category contain it
+        trigrams = {}
+        for row in self._prod_index:
+            for g in _row_trigrams(row):
+                trigrams.setdefault(g, set()).add(row[0])
+        self._prod_trigrams = trigrams
+        self._last_q = None
+        self._categories_dirty = True
+
+    def _index_product_add(self, key):
+        """Index (or re-index) self.products[key] without rebuilding everything."""
+        if key in self._prod_rows_by_key:
+            self._index_product_remove(key)
+        row = _product_index_row(key, self.products[key])
+        i = bisect.bisect_left(self._product_keys_sorted, key)
+        self._product_keys_sorted.insert(i, key)
+        self._prod_index.insert(i, row)
+        self._prod_rows_by_key[key] = row
+        for g in _row_trigrams(row):
+            self._prod_trigrams.setdefault(g, set()).add(key)
+        self._product_keys_concat = None
+        self._last_q = None
+        self._categories_dirty = True
+
+    def _index_product_remove(self, key):
+        row = self._prod_rows_by_key.pop(key, None)
+        if row is None:
+            return
+        i = bisect.bisect_left(self._product_keys_sorted, key)
+        del self._product_keys_sorted[i]
+        del self._prod_index[i]
+        for g in _row_trigrams(row):
+            keys = self._prod_trigrams.get(g)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._prod_trigrams[g]
+        self._product_keys_concat = None
+        self._last_q = None
+        self._categories_dirty = True
+
+    def _prefix_matches(self, val, limit=20):
+        # the keys sharing a prefix are one contiguous run of the sorted list, so
+        # two bisections bound it and the slice is taken in C (same effect as a trie walk)
+        keys = self._product_keys_sorted
+        lo = bisect.bisect_left(keys, val)
+        hi = bisect.bisect_left(keys, val + "\U0010ffff", lo, min(len(keys), lo + limit))
+        return keys[lo:hi]
+
     def show_suggestions(self, event):
-        val = self.item_name.get().lower()
+        # navigation keys are handled by their own bindings; modifiers can't change the text
+        if event is not None and getattr(event, "keysym", "") in SUGGEST_IGNORED_KEYS:
+            return
+        # debounce: only search once typing pauses
+        if self._suggest_job is not None:
+            self.root.after_cancel(self._suggest_job)
+        self._suggest_job = self.root.after(80, self._do_suggest)
+
+    def _cancel_suggest(self):
+        if self._suggest_job is not None:
+            self.root.after_cancel(self._suggest_job)
+            self._suggest_job = None
+
+    def _hide_suggestions(self):
+        self.suggestion_box.grid_remove()
+        self._last_q = None
+
+    def _do_suggest(self):
+        self._suggest_job = None
+        val = self.item_name.get().strip().lower()
+        # the key did not change the query (e.g. Delete at the end of the text)
+        if val == self._last_q:
+            return
+        self._last_q = val
         if not val:
             self.suggestion_box.grid_remove()
             return
-        matches = [p for p in self.products if val in p]
+        matches = self._prefix_matches(val)
+        if not matches:
+            # fall back to substring match for mid-name queries
+            if self._product_keys_concat is None:
+                # newline-joined keys let the substring fallback run as one C-level regex scan
+                self._product_keys_concat = "\n".join(self._product_keys_sorted)
+            matches = re.findall(rf"(?m)^.*{re.escape(val)}.*$", self._product_keys_concat)[:20]
         if matches:
-            self.suggestion_box.delete(0, tk.END)
-            for m in matches[:20]:
-                self.suggestion_box.insert(tk.END, m)
+            matches = tuple(matches)
+            # typing past a unique prefix often yields the same list; keep the widget as is
+            if matches != self._last_suggestions:
+                self.suggestion_box.delete(0, tk.END)
+                # one Tcl call for the whole batch
+                self.suggestion_box.insert(tk.END, *matches)
+                self._last_suggestions = matches
             self.suggestion_box.grid()
         else:
             self.suggestion_box.grid_remove()
 
     def fill_from_suggestion(self, event=None):
+        self._cancel_suggest()
         sel = self.suggestion_box.curselection()
         if sel:
             val = self.suggestion_box.get(sel)
@@ -892,7 +1548,7 @@ class BillingApp:
             self.item_mrp.delete(0, tk.END); self.item_mrp.insert(0, prod.get("mrp", ""))
             self.item_rate.delete(0, tk.END); self.item_rate.insert(0, prod.get("rate", ""))
             self.item_discount.delete(0, tk.END); self.item_discount.insert(0, prod.get("discount", ""))
-            self.suggestion_box.grid_remove()
+            self._hide_suggestions()
             self.item_qty.focus()
 
     def move_down(self, event):
@@ -915,24 +1571,26 @@ class BillingApp:
 
     # ---------------- Billing actions ----------------
     def add_item(self):
+        name = self.item_name.get().strip()
         try:
-            name = self.item_name.get().strip()
-            mrp = float(self.item_mrp.get() or 0)
-            rate = float(self.item_rate.get() or 0)
-            disc = float(self.item_discount.get() or 0)
-            qty = int(self.item_qty.get() or 0)
-        except Exception:
+            mrp = entry_number(self.item_mrp, float)
+            rate = entry_number(self.item_rate, float)
+            disc = entry_number(self.item_discount, float)
+            qty = entry_number(self.item_qty, int)
+        except ValueError:
             messagebox.showerror("Error","Invalid item details")
             return
         if not name:
             messagebox.showerror("Error","Item name required")
             return
         total = round(rate * qty * (1 - disc/100), 2)
-        self.items_in_bill.append({"name":name,"mrp":mrp,"rate":rate,"discount":disc,"qty":qty,"total":total})
+        item = {"name":name,"mrp":mrp,"rate":rate,"discount":disc,"qty":qty,"total":total}
+        self.items_in_bill.append(item)
+        self.sub_total += total
         try: self._push_snapshot()
         except: pass
         self.update_totals()
-        self.refresh_tree()
+        self._insert_tree_row(len(self.items_in_bill) - 1, item)
         self.item_name.delete(0, tk.END)
         self.item_mrp.delete(0, tk.END)
         self.item_rate.delete(0, tk.END)
@@ -943,36 +1601,28 @@ class BillingApp:
         sel = self.tree.selection()
         if not sel:
             return
-        try:
-            index = int(sel[0])
-        except:
-            for s in sel:
-                try:
-                    self.tree.delete(s)
-                except:
-                    pass
-            return
+        index = self.tree.index(sel[0])
         if 0 <= index < len(self.items_in_bill):
-            del self.items_in_bill[index]
+            self.sub_total -= self.items_in_bill.pop(index)["total"]
+        self.tree.delete(sel[0])
         try: self._push_snapshot()
         except: pass
         self.update_totals()
-        self.refresh_tree()
+        self._retag_tree(index)
 
     def duplicate_selected_item(self):
         sel = self.tree.selection()
         if not sel:
             return
-        try:
-            idx = int(sel[0])
-        except:
-            return
+        idx = self.tree.index(sel[0])
         if 0 <= idx < len(self.items_in_bill):
             item = self.items_in_bill[idx].copy()
             self.items_in_bill.insert(idx+1, item)
+            self.sub_total += item["total"]
             try: self._push_snapshot()
             except: pass
-            self.refresh_tree()
+            self._insert_tree_row(idx+1, item)
+            self._retag_tree(idx+2)
             self.update_totals()
 
     def edit_selected_item(self):
@@ -980,10 +1630,7 @@ class BillingApp:
         if not sel:
             messagebox.showinfo("Edit Item", "Select an item in the list and press Ctrl+E or double-click.")
             return
-        try:
-            idx = int(sel[0])
-        except:
-            return
+        idx = self.tree.index(sel[0])
         if not (0 <= idx < len(self.items_in_bill)):
             return
         item = self.items_in_bill[idx]
@@ -1000,47 +1647,48 @@ class BillingApp:
             messagebox.showerror("Error", "Invalid values entered")
             return
 
+        self.sub_total -= item["total"]
         item.update({"name": new_name, "mrp": new_mrp, "rate": new_rate, "discount": new_disc, "qty": new_qty})
         item["total"] = round(item["rate"] * item["qty"] * (1 - item["discount"]/100), 2)
+        self.sub_total += item["total"]
         try: self._push_snapshot()
         except: pass
-        self.refresh_tree()
+        self.tree.item(sel[0], values=self._row_values(item), tags=(self._row_tag(idx, item),))
         self.update_totals()
 
     def move_item_up(self):
         sel = self.tree.selection()
         if not sel:
             return
-        try:
-            idx = int(sel[0])
-        except:
-            return
+        idx = self.tree.index(sel[0])
         if idx <= 0:
             return
         self.items_in_bill[idx-1], self.items_in_bill[idx] = self.items_in_bill[idx], self.items_in_bill[idx-1]
         try: self._push_snapshot()
         except: pass
-        self.refresh_tree()
-        self.tree.selection_set(str(idx-1))
+        self.tree.move(sel[0], "", idx-1)
+        self._retag_tree(idx-1, idx+1)
+        self.tree.selection_set(sel[0])
 
     def move_item_down(self):
         sel = self.tree.selection()
         if not sel:
             return
-        try:
-            idx = int(sel[0])
-        except:
-            return
+        idx = self.tree.index(sel[0])
         if idx >= len(self.items_in_bill)-1:
             return
         self.items_in_bill[idx+1], self.items_in_bill[idx] = self.items_in_bill[idx], self.items_in_bill[idx+1]
         try: self._push_snapshot()
         except: pass
-        self.refresh_tree()
-        self.tree.selection_set(str(idx+1))
+        self.tree.move(sel[0], "", idx+1)
+        self._retag_tree(idx, idx+2)
+        self.tree.selection_set(sel[0])
 
     def clear_all(self):
+        # the next bill gets a new number; a save in flight already holds its snapshot
+        self._pending_bill_no = None
         self.items_in_bill.clear()
+        self.sub_total = 0.0
         try: self._push_snapshot()
         except: pass
         self.update_totals()
@@ -1055,9 +1703,14 @@ class BillingApp:
     def new_client(self):
         self.clear_all()
 
-    def update_totals(self):
-        self.sub_total = sum(i["total"] for i in self.items_in_bill)
-        gst_amt = round(self.sub_total * self.gst_percent.get() / 100, 2)
+    def update_totals(self, recalc=False):
+        # sub_total is maintained incrementally by the item actions; a full
+        # re-sum is only done on request. Item totals are rounded to paise, so
+        # re-rounding the running sum cancels float drift without a re-sum.
+        if recalc:
+            self.sub_total = sum(map(itemgetter("total"), self.items_in_bill))
+        self.sub_total = round(self.sub_total, 2)
+        gst_amt = round(self.sub_total * self._gst / 100, 2)
         self.total = self.sub_total + gst_amt
         self.sub_label.config(text=f"SubTotal: {self.sub_total:.2f}")
         self.gst_label.config(text=f"GST: {gst_amt:.2f}")
@@ -1066,15 +1719,35 @@ class BillingApp:
         self.update_due()
 
     def update_due(self):
-        paid = self.paid_amount.get()
-        due = self.total - paid
+        due = self.total - self._paid
         self.due_label.config(text=f"{due:.2f}")
 
+    # The tree mirrors items_in_bill row for row; item actions patch the
+    # affected rows and refresh_tree() is only used for wholesale changes.
     def refresh_tree(self):
         self.tree.delete(*self.tree.get_children())
-        for idx, item in enumerate(self.items_in_bill):
-            tag = "lowstock" if item["qty"] <= self.low_stock_threshold else ("evenrow" if idx%2==0 else "oddrow")
-            self.tree.insert("", tk.END, iid=str(idx), values=(item["name"], item["mrp"], item["rate"], item["discount"], item["qty"], item["total"]), tags=(tag,))
+        # reverse order at index 0: each insert is O(1) instead of a walk to the end
+        for idx in range(len(self.items_in_bill) - 1, -1, -1):
+            self._insert_tree_row(idx, self.items_in_bill[idx], position=0)
+
+    def _row_tag(self, idx, item):
+        return "lowstock" if item["qty"] <= self.low_stock_threshold else ("evenrow" if idx%2==0 else "oddrow")
+
+    @staticmethod
+    def _row_values(item):
+        return (item["name"], item["mrp"], item["rate"], item["discount"], item["qty"], item["total"])
+
+    def _insert_tree_row(self, idx, item, position=None):
+        self._row_seq += 1
+        self.tree.insert("", idx if position is None else position, iid=str(self._row_seq),
+                         values=self._row_values(item), tags=(self._row_tag(idx, item),))
+
+    def _retag_tree(self, start=0, stop=None):
+        """Re-apply zebra/low-stock tags to rows start..stop after a reorder."""
+        children = self.tree.get_children()
+        stop = len(children) if stop is None else min(stop, len(children))
+        for idx in range(start, stop):
+            self.tree.item(children[idx], tags=(self._row_tag(idx, self.items_in_bill[idx]),))
 
     # ---------------- Customer persistence ----------------
     def save_customer(self):
@@ -1083,75 +1756,97 @@ class BillingApp:
         if not name or not phone:
             messagebox.showwarning("Save Customer", "Name and phone required.")
             return
-        wb = Workbook()
-        if os.path.exists(CUSTOMER_FILE):
-            wb = load_workbook(CUSTOMER_FILE)
-        ws = wb.active
-        ws.append([name, phone, str(datetime.now())])
-        wb.save(CUSTOMER_FILE)
+        try:
+            append_customer(name, phone)
+        except Exception as e:
+            messagebox.showerror("Save Customer", str(e))
+            logging.exception("Failed to save customer")
+            return
         messagebox.showinfo("Saved", "Customer saved")
 
+    def export_customers_ui(self):
+        fp = filedialog.asksaveasfilename(defaultextension=".xlsx", initialfile=CUSTOMER_FILE,
+                                          filetypes=[("Excel Files", "*.xlsx")])
+        if not fp:
+            return
+        try:
+            export_customers_xlsx(fp)
+            messagebox.showinfo("Exported", f"Customers exported to {fp}")
+        except Exception as e:
+            messagebox.showerror("Export failed", str(e))
+            logging.exception("Customer export failed")
+
     def delete_low_stock_items(self):
-        self.items_in_bill = [i for i in self.items_in_bill if i["qty"] > self.low_stock_threshold]
+        children = self.tree.get_children()
+        drop = [idx for idx, i in enumerate(self.items_in_bill) if i["qty"] <= self.low_stock_threshold]
+        if drop:
+            dropped = set(drop)
+            self.items_in_bill = [i for idx, i in enumerate(self.items_in_bill) if idx not in dropped]
+            # remove just those rows; only the zebra tags after the first gap change
+            self.tree.delete(*(children[idx] for idx in drop))
+            self._retag_tree(drop[0])
         try: self._push_snapshot()
         except: pass
-        self.update_totals()
-        self.refresh_tree()
+        self.update_totals(recalc=True)
 
     def set_low_stock_threshold(self):
         try:
             self.low_stock_threshold = int(self.threshold_entry.get())
             messagebox.showinfo("Threshold","Low stock threshold updated")
-            self.refresh_tree()
+            self._retag_tree()
         except:
             messagebox.showerror("Error","Invalid threshold")
 
     # ---------------- PDF saving ----------------
+    def bill_snapshot(self, bill_no):
+        """Plain-data copy of the current bill, safe to hand to a worker thread."""
+        return {
+            "bill_no": bill_no,
+            "date": datetime.now(),
+            "customer": self.cust_name.get(),
+            "phone": self.cust_phone.get(),
+            "items": [dict(it) for it in self.items_in_bill],
+            "sub_total": self.sub_total,
+            "gst": self.sub_total * self._gst / 100,
+            "total": self.total,
+            "paid": self._paid,
+        }
+
     def print_and_save_pdf(self):
-        bill_no, _ = get_next_bill_no()
-        pdf_file = get_next_pdf_filename()
-        try:
-            c = canvas.Canvas(pdf_file, pagesize=A4)
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(60, 800, SHOP_NAME)
-            c.setFont("Helvetica", 10)
-            c.drawString(60, 785, SHOP_ADDRESS)
-            c.drawString(60, 770, SHOP_PHONE)
-            c.setFont("Helvetica", 10)
-            c.drawString(400, 740, f"Bill No: {bill_no}")
-            c.drawString(400, 725, f"Date: {datetime.now().strftime('%d-%m-%Y %H:%M')}")
-            data = [["Item","MRP","Rate","Disc%","Qty","Total"]]
-            for it in self.items_in_bill:
-                data.append([it["name"], it["mrp"], it["rate"], it["discount"], it["qty"], it["total"]])
-            table = Table(data, colWidths=[200,50,50,50,40,60])
-            table.setStyle(TableStyle([("GRID",(0,0),(-1,-1),0.5,colors.black),
-                                       ("FONT",(0,0),(-1,0),"Helvetica-Bold")] ))
-            table.wrapOn(c, 40, 600)
-            table.drawOn(c, 40, 600 - len(data)*18)
-            y = 600 - len(data)*18 - 20
-            c.drawString(40, y, f"SubTotal: {self.sub_total:.2f}")
-            y -= 14
-            gst_amt = self.sub_total * self.gst_percent.get() / 100
-            c.drawString(40, y, f"GST: {gst_amt:.2f}")
-            y -= 14
-            c.drawString(40, y, f"Total: {self.total:.2f}")
-            c.save()
-            messagebox.showinfo("PDF Saved", f"Bill saved as {pdf_file}")
-            # save to DB as well
+        # same number as a receipt already printed for this bill
+        bill_no, _ = self.current_bill_no()
+        pdf_file = self.get_next_pdf_filename()
+        bill = self.bill_snapshot(bill_no)
+        def notify(fn, *args):
+            self.root.after(0, lambda: fn(*args))
+        # layout + disk write run off the Tk thread; the worker only sees the snapshot
+        def task():
             try:
-                save_bill_to_db(self)
+                build_bill_pdf(pdf_file, bill)
+            except Exception as e:
+                logging.exception("PDF generation failed")
+                notify(messagebox.showerror, "PDF Error", f"Failed to create PDF: {e}")
+                return
+            # save to DB as well, with the same number as the PDF
+            try:
+                save_bill_to_db(self, conn=self.db, bill=bill)
             except Exception:
                 logging.exception("Failed to save bill to DB")
-        except Exception as e:
-            messagebox.showerror("PDF Error", f"Failed to create PDF: {e}")
-            logging.exception("PDF generation failed")
+            notify(messagebox.showinfo, "PDF Saved", f"Bill saved as {pdf_file}")
+        threading.Thread(target=task, daemon=True).start()
 
     def open_read_pdf(self):
         file = filedialog.askopenfilename(filetypes=[("PDF Files","*.pdf")])
         if file:
-            text = read_pdf(file)
+            text = read_pdf(file, max_pages=READ_PDF_PREVIEW_PAGES)
             win = tk.Toplevel(self.root)
             win.title("PDF Content")
+            # only the first pages are extracted; say so, or a long merged PDF looks complete
+            pages = pdf_page_count(file)
+            if pages and pages > READ_PDF_PREVIEW_PAGES:
+                note = f"(showing first {READ_PDF_PREVIEW_PAGES} of {pages} pages)"
+                win.title(f"PDF Content {note}")
+                tk.Label(win, text=note, fg="#a00").pack(anchor="w", padx=6, pady=(4,0))
             txt = tk.Text(win, width=100, height=30)
             txt.pack(fill="both", expand=True)
             txt.insert(tk.END, text)
@@ -1165,127 +1860,263 @@ class BillingApp:
 
     # ---------------- Print preview & printing (TEXT receipt) ----------------
     def show_print_tab(self):
+        # font metrics are shared by every Canvas; load them while the user reviews the preview
+        if not _reportlab_warm:
+            threading.Thread(target=warm_reportlab, daemon=True).start()
         self.refresh_printer_list()
         self.refresh_print_bill()
         self.notebook.select(self.print_frame)
 
     def refresh_print_bill(self):
-        self.bill_preview.delete("1.0", tk.END)
-        bill_no, _ = get_next_bill_no()
-        lines = []
-        lines.append(f"{SHOP_NAME}\n")
-        lines.append(f"{SHOP_ADDRESS}\n")
-        lines.append(f"{SHOP_PHONE}\n")
-        lines.append("="*60 + "\n")
-        lines.append(f"Bill No: {bill_no:<10} Date: {datetime.now().strftime('%d-%m-%Y %H:%M')}\n")
-        lines.append("="*60 + "\n")
-        lines.append(f"{'Item':20}{'MRP':>6}{'Rate':>7}{'Disc%':>7}{'Qty':>6}{'Total':>9}\n")
-        lines.append("-"*60 + "\n")
-        for i in self.items_in_bill:
-            lines.append(f"{i['name'][:20]:20}{i['mrp']:>6.2f}{i['rate']:>7.2f}{i['discount']:>7.2f}{i['qty']:>6}{i['total']:>9.2f}\n")
-        lines.append("-"*60 + "\n")
-        lines.append(f"SubTotal: {self.sub_total:.2f}\n")
-        gst_amt = self.sub_total * self.gst_percent.get() / 100
-        lines.append(f"GST: {gst_amt:.2f}\n")
-        lines.append(f"Total: {self.total:.2f}\n")
-        paid = self.paid_amount.get()
-        due = self.total - paid
-        lines.append(f"Paid: {paid:.2f}  Due: {due:.2f}\n")
-        lines.append("="*60 + "\n")
-        self.bill_preview.insert(tk.END, "".join(lines))
+        row_fmt = ROW_FMT.format_map
+        text = "".join((
+            RECEIPT_HEADER,
+            RECEIPT_BILL_FMT.format(bill_no=self._pending_bill_no[0] if self._pending_bill_no else self.peek_bill_no(), date=datetime.now().strftime('%d-%m-%Y %H:%M')),
+            "".join(map(row_fmt, self.items_in_bill)),
+            RECEIPT_FOOTER_FMT.format(sub_total=self.sub_total, gst=self.sub_total * self._gst / 100,
+                                      total=self.total, paid=self._paid, due=self.total - self._paid),
+        ))
+        # one replace call instead of delete + insert (single widget update)
+        self.bill_preview.replace("1.0", tk.END, text)
+
+    def _render_print_pdf(self, text):
+        """Render the preview text to a temp PDF and return its path."""
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        # render in memory; the shell print verb still needs a file, written in one go below
+        buf = io.BytesIO()
+        c = canvas.Canvas(buf, pagesize=A4)
+        width, height = A4
+        margin = 40
+        y = height - margin
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(margin, y, SHOP_NAME)
+        y -= 18
+        c.setFont("Helvetica", 10)
+        c.drawString(margin, y, SHOP_ADDRESS)
+        y -= 14
+        c.drawString(margin, y, SHOP_PHONE)
+        y -= 20
+        c.setFont("Helvetica", 9)
+        c.drawString(margin, y, "-" * 95)
+        y -= 16
+        line_height = 12
+        # loop-invariant geometry and bound methods, hoisted out of the page loop
+        min_y = margin + line_height
+        top_y = height - margin
+        wrap = _PRINT_WRAPPER.wrap
+        ww = PRINT_WRAP_WIDTH
+        # rows are produced lazily, one page at a time; Tk's Text.get always
+        # appends a newline, which must not print as an extra row. Receipt lines
+        # are ~60 columns, so most never need the wrapper at all.
+        rows = (piece for line in iter_lines(text.rstrip("\n"))
+                for piece in ((line,) if len(line) <= ww else wrap(line)))
+        # rows per page are fixed, so paginate by striding through rows;
+        # the first page starts below the shop header
+        per_page = int((y - min_y) // line_height) + 1
+        full_page = int((top_y - min_y) // line_height) + 1
+        page = list(islice(rows, per_page))
+        while True:
+            # Font state persists across the whole page - do not reload it per row.
+            # showPage() resets it, so this is the only setFont in the loop and it
+            # runs once per page. The leading set here makes each page one text object.
+            c.setFont("Courier", 9, line_height)
+            # one BT/ET block per page instead of a drawString per row
+            tobj = c.beginText(margin, y)
+            for piece in page:
+                tobj.textLine(piece)
+            c.drawText(tobj)
+            page = list(islice(rows, full_page))
+            if not page:
+                break
+            c.showPage()
+            y = top_y
+        c.save()
+        # write the finished document straight to the mkstemp descriptor
+        data = buf.getbuffer()
+        fd, tmp_pdf = tempfile.mkstemp(prefix=PRINT_TMP_PREFIX, suffix=".pdf")
+        try:
+            written = 0
+            while written < len(data):
+                written += os.write(fd, data[written:])
+        finally:
+            data.release()
+            os.close(fd)
+        return tmp_pdf
 
     def print_bill_to_printer(self):
+        # the preview always carries the shop header, so check the bill itself
+        # before paying for a render + spool of a blank receipt
+        if not self.items_in_bill:
+            messagebox.showinfo("Nothing to print", "Bill is empty.")
+            return
         text = self.bill_preview.get("1.0", tk.END)
         if not text.strip():
             messagebox.showerror("Error", "Nothing to print")
             return
-        try:
-            tmp_pdf = tempfile.mktemp(suffix=".pdf")
-            c = canvas.Canvas(tmp_pdf, pagesize=A4)
-            width, height = A4
-            margin = 40
-            y = height - margin
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(margin, y, SHOP_NAME)
-            y -= 18
-            c.setFont("Helvetica", 10)
-            c.drawString(margin, y, SHOP_ADDRESS)
-            y -= 14
-            c.drawString(margin, y, SHOP_PHONE)
-            y -= 20
-            c.setFont("Helvetica", 9)
-            c.drawString(margin, y, "-" * 95)
-            y -= 16
-            lines = text.splitlines()
-            c.setFont("Courier", 9)
-            line_height = 12
-            max_lines = int((y - margin) / line_height) or 40
-            idx = 0
-            while idx < len(lines):
-                for _ in range(max_lines):
-                    if idx >= len(lines):
-                        break
-                    line = lines[idx]
-                    while len(line) > 0:
-                        piece = line[:110]
-                        c.drawString(margin, y, piece)
-                        y -= line_height
-                        line = line[110:]
-                        if y < margin + line_height:
-                            break
-                    if y < margin + line_height:
-                        break
-                    idx += 1
-                if idx < len(lines):
-                    c.showPage()
-                    y = height - margin
-                    c.setFont("Courier", 9)
-            c.save()
-        except Exception as e:
-            messagebox.showerror("PDF Error", f"Failed to create PDF for printing: {e}")
-            logging.exception("Failed to create temp PDF for printing")
-            return
-        try:
-            selected = self.printer_var.get()
-            if selected == "<No printers found>":
-                selected = None
-        except:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        pv = getattr(self, "printer_var", None)
+        selected = pv.get() if pv is not None else None
+        if selected == "<No printers found>":
             selected = None
-        if win32print and selected:
+        if win32print and self.settings.get("raw_print"):
+            # text receipt straight to the spooler: no PDF render, no reader app
+            self.current_bill_no()
+            data = RAW_PRINT_INIT + text.encode(RAW_PRINT_ENCODING, "replace")
+            threading.Thread(target=self._dispatch_raw_print, args=(data, selected), daemon=True).start()
+            return
+        # a reprint of an unchanged preview reuses the PDF rendered last time
+        tmp_pdf = self._print_pdf_cache.get(key)
+        if tmp_pdf and os.path.exists(tmp_pdf):
+            self._print_pdf_cache.move_to_end(key)
+            self._send_print_pdf(tmp_pdf, selected)
+            return
+        # render off the Tk thread (_render_print_pdf only touches ReportLab and disk)
+        def task():
             try:
-                win32print.ShellExecute(0, "print", tmp_pdf, f'/d:"{selected}"', ".", 0)
-                messagebox.showinfo("Printed", f"Bill sent to printer: {selected}")
-                return
+                pdf = self._render_print_pdf(text)
             except Exception as e:
-                messagebox.showwarning("Print Error", f"Could not print to '{selected}': {e}\nTrying default printer...")
-                logging.exception("Targeted print failed")
-        if win32print:
-            try:
-                default = win32print.GetDefaultPrinter()
-                win32print.ShellExecute(0, "print", tmp_pdf, f'/d:"{default}"', ".", 0)
-                messagebox.showinfo("Printed", f"Bill sent to default printer: {default}")
-                return
-            except Exception:
-                try:
-                    os.startfile(tmp_pdf)
-                    messagebox.showinfo("PDF Ready", f"PDF opened for printing: {tmp_pdf}")
-                except Exception:
-                    messagebox.showinfo("PDF Saved", f"PDF saved to: {tmp_pdf}")
+                logging.exception("Failed to create temp PDF for printing")
+                self.root.after(0, lambda err=e: messagebox.showerror("PDF Error", f"Failed to create PDF for printing: {err}"))
                 return
+            self.root.after(0, lambda: self._on_print_pdf_rendered(key, pdf, selected))
+        threading.Thread(target=task, daemon=True).start()
+
+    def _on_print_pdf_rendered(self, key, tmp_pdf, selected):
+        # a second render of the same preview (double-clicked Print) replaces the first
+        old_pdf = self._print_pdf_cache.get(key)
+        if old_pdf and old_pdf != tmp_pdf:
+            self._discard_print_pdf(old_pdf)
+        self._print_pdf_cache[key] = tmp_pdf
+        if len(self._print_pdf_cache) > PRINT_PDF_CACHE_SIZE:
+            _, old_pdf = self._print_pdf_cache.popitem(last=False)
+            self._discard_print_pdf(old_pdf)
+        # repeated renders of the same bill keep its number
+        self.current_bill_no()
+        self._send_print_pdf(tmp_pdf, selected)
+
+    def _discard_print_pdf(self, tmp_pdf):
+        # give the spooler / viewer time to finish with it before deleting
+        def remove():
+            self._print_pdf_sent.pop(tmp_pdf, None)
+            remove_quietly(tmp_pdf)
+        self.root.after(PRINT_TMP_GRACE_MS, remove)
+
+    def _send_print_pdf(self, tmp_pdf, selected):
+        self._print_pdf_sent[tmp_pdf] = time.monotonic()
+        if win32print:
+            # ShellExecute waits on the shell/spooler; keep it off the Tk thread
+            threading.Thread(target=self._dispatch_print, args=(tmp_pdf, selected), daemon=True).start()
+            return
         try:
+            # exec the opener directly; no intermediate shell, no quoting issues
             if sys.platform == "darwin":
-                os.system(f'open "{tmp_pdf}"')
+                subprocess.Popen(["open", tmp_pdf], close_fds=True)
             elif os.name == "nt":
                 os.startfile(tmp_pdf)
             else:
-                os.system(f'xdg-open "{tmp_pdf}"')
+                subprocess.Popen(["xdg-open", tmp_pdf], close_fds=True)
             messagebox.showinfo("PDF Ready", f"PDF saved and opened for manual printing:\n{tmp_pdf}")
         except Exception:
             messagebox.showinfo("PDF Saved", f"PDF saved to: {tmp_pdf}\nPlease open and print manually.")
 
-    # ---------------- Auto-save stub ----------------
-    def auto_save_bill(self):
-        self.root.after(self.auto_save_interval, self.auto_save_bill)
+    def _dispatch_print(self, tmp_pdf, selected):
+        """Worker thread: hand tmp_pdf to the Windows shell, report back via root.after."""
+        def notify(fn, *args):
+            self.root.after(0, lambda: fn(*args))
+        if selected:
+            err = self._spool(tmp_pdf, selected)
+            if err is None:
+                notify(messagebox.showinfo, "Printed", f"Bill sent to printer: {selected}")
+                return
+            notify(messagebox.showwarning, "Print Error", f"Could not print to '{selected}': {err}\nTrying default printer...")
+        try:
+            default = win32print.GetDefaultPrinter()
+        except Exception:
+            default = None
+        if default and self._spool(tmp_pdf, default) is None:
+            notify(messagebox.showinfo, "Printed", f"Bill sent to default printer: {default}")
+            return
+        try:
+            os.startfile(tmp_pdf)
+            notify(messagebox.showinfo, "PDF Ready", f"PDF opened for printing: {tmp_pdf}")
+        except Exception:
+            notify(messagebox.showinfo, "PDF Saved", f"PDF saved to: {tmp_pdf}")
+
+    def _dispatch_raw_print(self, data, selected):
+        """Worker thread: write data as a RAW job to selected (or the default printer)."""
+        printer = selected
+        if not printer:
+            try:
+                printer = win32print.GetDefaultPrinter()
+            except Exception:
+                printer = None
+        err = self._spool_raw(data, printer) if printer else "no printer selected"
+        if err is None:
+            self.root.after(0, lambda: messagebox.showinfo("Printed", f"Bill sent to printer: {printer}"))
+        else:
+            self.root.after(0, lambda: messagebox.showerror("Print Error", f"Could not print to '{printer}': {err}"))
+
+    @staticmethod
+    def _spool_raw(data, printer):
+        """Write data to printer as one RAW document; return None on success, else the error."""
+        try:
+            h = win32print.OpenPrinter(printer)
+            try:
+                win32print.StartDocPrinter(h, 1, ("Bill", None, "RAW"))
+                try:
+                    win32print.StartPagePrinter(h)
+                    win32print.WritePrinter(h, data)
+                    win32print.EndPagePrinter(h)
+                finally:
+                    win32print.EndDocPrinter(h)
+            finally:
+                win32print.ClosePrinter(h)
+            return None
+        except Exception as e:
+            logging.exception(f"Raw print to '{printer}' failed")
+            return e
+
+    @staticmethod
+    def _spool(tmp_pdf, printer):
+        """ShellExecute the print verb on printer; return None on success, else the error."""
+        try:
+            win32print.ShellExecute(0, "print", tmp_pdf, f'/d:"{printer}"', ".", 0)
+            return None
+        except Exception as e:
+            logging.exception(f"Print to '{printer}' failed")
+            return e
+
+    # ---------------- Bill counter retry ----------------
+    def _schedule_counter_retry(self):
+        if self._counter_retry_job is None:
+            self._counter_retry_job = self.root.after(BILL_COUNTER_RETRY_MS, self._retry_counter_write)
+
+    def _retry_counter_write(self):
+        # one-shot; a still-failing write is retried by the next bill or on close
+        self._counter_retry_job = None
+        self._write_bill_counter()
+
+    def _flush_pending(self):
+        # only a failed counter write can be pending
+        self._write_bill_counter()
+
+    def on_close(self):
+        if self._counter_retry_job is not None:
+            try: self.root.after_cancel(self._counter_retry_job)
+            except: pass
+            self._counter_retry_job = None
+        self._flush_pending()
+        # ShellExecute "print" returns before the reader has spooled the file; files
+        # sent within the grace period, and evicted ones whose delayed delete never
+        # runs after destroy(), are removed by sweep_print_tmp at the next start
+        cutoff = time.monotonic() - PRINT_TMP_GRACE_MS / 1000
+        for tmp_pdf in self._print_pdf_cache.values():
+            if self._print_pdf_sent.get(tmp_pdf, 0) < cutoff:
+                remove_quietly(tmp_pdf)
+        try: self.db.close()
+        except: pass
+        self.root.destroy()
 
     # ---------------- Utility/key helpers ----------------
     def enter_key_pressed(self, event):
@@ -1326,7 +2157,7 @@ class BillingApp:
             # show progress window while importing
             pw = ProgressWindow(self.root, title="Importing products...", maxval=100)
             def task():
-                products = import_products_csv(fp)
+                products = import_products_csv(fp, conn=self.db)
                 pw.set(100, "Done")
                 time.sleep(0.2)
                 pw.close()
@@ -1358,7 +2189,7 @@ class BillingApp:
         self.prod_search_var = tk.StringVar()
         sv = tk.Entry(left, textvariable=self.prod_search_var, width=40)
         sv.pack(padx=6)
-        sv.bind("<KeyRelease>", lambda e: self.refresh_products_view())
+        sv.bind("<KeyRelease>", self._schedule_products_filter)
 
         # Filters frame
         fframe = tk.Frame(left)
@@ -1382,6 +2213,20 @@ class BillingApp:
         self.prod_tree.bind("<<TreeviewSelect>>", lambda e: self.on_product_select())
         self.prod_tree.bind("<Double-1>", lambda e: self.open_edit_product_dialog())
 
+        # pagination: only page_size rows live in the tree at a time
+        self._prod_rows = []
+        self._prod_page = 0
+        try:
+            self._prod_page_size = max(1, int(self.settings.get("page_size", 200)))
+        except:
+            self._prod_page_size = 200
+        pgf = tk.Frame(left)
+        pgf.pack(fill="x", padx=6)
+        tk.Button(pgf, text="< Prev", command=lambda: self._show_products_page(self._prod_page - 1)).pack(side="left")
+        self.prod_page_label = tk.Label(pgf, text="")
+        self.prod_page_label.pack(side="left", expand=True)
+        tk.Button(pgf, text="Next >", command=lambda: self._show_products_page(self._prod_page + 1)).pack(side="right")
+
         # Buttons under list
         btnf = tk.Frame(left)
         btnf.pack(fill="x", padx=6, pady=6)
@@ -1424,68 +2269,129 @@ class BillingApp:
         stock_frame.pack(fill="x", padx=6, pady=6)
         tk.Button(stock_frame, text="Set Quantity", command=self.set_qty_for_selected).pack(side="left", padx=6)
         tk.Button(stock_frame, text="Adjust Qty (+/-)", command=self.adjust_qty_for_selected).pack(side="left", padx=6)
+        # inline qty editing: no modal dialog per change
+        self.prod_qty_var = tk.StringVar(value="0")
+        tk.Spinbox(stock_frame, from_=-999999, to=999999, textvariable=self.prod_qty_var, width=8).pack(side="left", padx=(12,2))
+        tk.Button(stock_frame, text="Set", command=self.apply_inline_qty).pack(side="left", padx=2)
+        tk.Button(stock_frame, text="+1", command=lambda: self.apply_inline_qty(1)).pack(side="left", padx=2)
+        tk.Button(stock_frame, text="-1", command=lambda: self.apply_inline_qty(-1)).pack(side="left", padx=2)
         tk.Button(stock_frame, text="Bulk Edit (CSV)", command=self.bulk_edit_products_csv).pack(side="left", padx=6)
-        tk.Button(stock_frame, text="Backup Products", command=lambda: messagebox.showinfo("Backup", backup_project())).pack(side="left", padx=6)
+        tk.Button(stock_frame, text="Backup Products", command=lambda: messagebox.showinfo("Backup", backup_project(conn=self.db))).pack(side="left", padx=6)
 
         # reports (simple)
         rep_frame = tk.LabelFrame(right, text="Reports", padx=8, pady=8)
         rep_frame.pack(fill="x", padx=6, pady=6)
-        tk.Button(rep_frame, text="Export sales by date", command=lambda: export_sales_report_csv()).pack(side="left", padx=6)
+        tk.Button(rep_frame, text="Export sales by date", command=lambda: export_sales_report_csv(conn=self.db)).pack(side="left", padx=6)
 
         # load products into view
         self.refresh_products_view()
 
     def _get_categories_list(self):
+        # never blocks on SQLite: a dirty cache is reloaded on a worker thread and
+        # the combobox is filled when it lands. The worker is started from the event
+        # loop (after_idle), so its root.after callback can't race __init__/mainloop
+        if self._categories_dirty and not self._categories_loading:
+            self._categories_dirty = False
+            self._categories_loading = True
+            self.root.after_idle(self._start_categories_load)
+        return self._categories_cache
+
+    def _start_categories_load(self):
+        threading.Thread(target=self._load_categories, daemon=True).start()
+
+    def _load_categories(self):
         try:
-            conn = sqlite3.connect(DB_FILE)
-            cur = conn.cursor()
-            cur.execute("SELECT name FROM categories ORDER BY name")
-            rows = cur.fetchall()
-            conn.close()
-            return [r[0] for r in rows]
+            with use_db(self.db) as conn:
+                rows = conn.execute("SELECT name FROM categories ORDER BY name").fetchall()
+            cats = tuple(r[0] for r in rows)
         except:
-            return []
+            logging.exception("Loading categories failed")
+            cats = None
+        try:
+            self.root.after(0, lambda: self._apply_categories(cats))
+        except RuntimeError:
+            # Tk is not servicing events (closing); allow a later reload
+            self._categories_loading = False
+            self._categories_dirty = True
+
+    def _apply_categories(self, cats):
+        self._categories_loading = False
+        if cats is None:
+            return
+        self._categories_cache = cats
+        try:
+            self.prod_cat_cb['values'] = cats
+        except:
+            pass
 
     def _clear_product_filters(self):
         self.prod_search_var.set("")
         self.prod_cat_var.set("")
         self.prod_brand_var.set("")
-        self.refresh_products_view()
+        self.refresh_products_view(first_page=True)
 
-    def refresh_products_view(self):
-        # repopulate categories combobox
+    def _apply_settings(self, settings):
+        self.settings = settings
         try:
-            self.prod_cat_cb['values'] = self._get_categories_list()
+            self._prod_page_size = max(1, int(settings.get("page_size", 200)))
         except:
-            pass
+            return
+        self.refresh_products_view(first_page=True)
+
+    def _schedule_products_filter(self, event=None):
+        # debounce: refilter once after a typing burst, not per keystroke
+        if self._prod_search_job is not None:
+            self.root.after_cancel(self._prod_search_job)
+        self._prod_search_job = self.root.after(150, self._run_products_filter)
+
+    def _run_products_filter(self):
+        self._prod_search_job = None
+        self.refresh_products_view(first_page=True)
+
+    def refresh_products_view(self, first_page=False):
+        # repopulate categories combobox only after a catalog change (in the background)
+        if self._categories_dirty:
+            self._get_categories_list()
         q = self.prod_search_var.get().strip().lower() if hasattr(self, "prod_search_var") else ""
         cat = (self.prod_cat_var.get().strip().lower() if hasattr(self, "prod_cat_var") else "")
         brand = (self.prod_brand_var.get().strip().lower() if hasattr(self, "prod_brand_var") else "")
-        # filter products
-        allp = self.products or {}
-        filtered = {}
-        for name,p in allp.items():
-            name_l = (p.get("name") or name).lower()
-            if q and q not in name_l and q not in (p.get("brand","") or "").lower() and q not in (p.get("category","") or "").lower():
-                continue
-            if cat and cat != "" and cat not in ((p.get("category") or "").lower()):
-                continue
-            if brand and brand != "" and brand not in ((p.get("brand") or "").lower()):
-                continue
-            filtered[name] = p
-        # clear tree
-        for i in self.prod_tree.get_children():
-            self.prod_tree.delete(i)
-        # insert
-        for name,p in sorted(filtered.items(), key=lambda x: x[0])[:10000]:
-            self.prod_tree.insert("", tk.END, iid=name, values=(p.get("name") or name, p.get("category") or "", p.get("brand") or "", p.get("rate") or 0, p.get("qty") or 0))
+        # filter products: plain substring tests on the pre-lowered index, already in key order
+        index = self._prod_index
+        if len(q) >= 3:
+            # only rows holding every trigram of the query can contain it
+            grams = {q[j:j+3] for j in range(len(q) - 2)}
+            postings = sorted((self._prod_trigrams.get(g, ()) for g in grams), key=len)
+            cand = set(postings[0]).intersection(*postings[1:])
+            rows = self._prod_rows_by_key
+            index = [rows[k] for k in sorted(cand)]
+        self._prod_rows = [(k, p) for k, name_l, brand_l, cat_l, p in index
+                           if (not q or q in name_l or q in brand_l or q in cat_l)
+                           and (not cat or cat in cat_l) and (not brand or brand in brand_l)]
+        self._show_products_page(0 if first_page else self._prod_page)
+
+    def _show_products_page(self, page):
+        rows = self._prod_rows
+        size = self._prod_page_size
+        pages = max(1, -(-len(rows) // size))
+        page = min(max(page, 0), pages - 1)
+        self._prod_page = page
+        self.prod_tree.delete(*self.prod_tree.get_children())
+        # ttk finds "end" by walking the child list; inserting the page in
+        # reverse at index 0 makes every insert O(1)
+        for name,p in reversed(rows[page*size:(page+1)*size]):
+            self.prod_tree.insert("", 0, iid=name, values=(p.get("name") or name, p.get("category") or "", p.get("brand") or "", p.get("rate") or 0, p.get("qty") or 0))
+        self.prod_page_label.configure(text=f"Page {page+1}/{pages} ({len(rows)} products)")
+
+    def _product_by_iid(self, iid):
+        # products tree iids are the lowercased product keys, so one lookup is enough
+        return self.products.get(iid)
 
     def on_product_select(self):
         sel = self.prod_tree.selection()
         if not sel:
             return
         key = sel[0]
-        p = self.products.get(key.lower()) or self.products.get(key)
+        p = self._product_by_iid(key)
         if not p:
             return
         # populate detail fields
@@ -1495,30 +2401,66 @@ class BillingApp:
                 ent.insert(0, str(p.get(k) if p.get(k) is not None else ""))
         except:
             pass
+        self.prod_qty_var.set(str(p.get("qty") or 0))
         # image preview
         img = p.get("image_path")
-        if img and os.path.exists(img) and Image and ImageTk:
+        # optional Pillow for the thumbnail preview
+        mtime = self._image_file_mtime(img) if img else None
+        pil = get_pil() if mtime is not None else None
+        if pil:
+            Image, ImageTk = pil
+            key = (img, mtime)
             try:
-                im = Image.open(img)
-                im.thumbnail((200,200))
-                self._prod_img_tk = ImageTk.PhotoImage(im)
+                thumb = self._thumb_cache.get(key)
+                if thumb is None:
+                    im = Image.open(img)
+                    im.thumbnail((200,200))
+                    thumb = self._thumb_cache[key] = ImageTk.PhotoImage(im)
+                    if len(self._thumb_cache) > THUMB_CACHE_SIZE:
+                        self._thumb_cache.popitem(last=False)
+                else:
+                    self._thumb_cache.move_to_end(key)
+                self._prod_img_tk = thumb
                 self.prod_image_label.configure(image=self._prod_img_tk, text="")
             except:
                 self.prod_image_label.configure(image="", text="Image load failed")
         else:
             self.prod_image_label.configure(image="", text="No image")
 
-    def open_add_product_dialog(self):
-        # simple dialog form
-        dlg = tk.Toplevel(self.root)
-        dlg.title("Add Product")
-        fields = ["sku","name","category","brand","size","color","hsn","mrp","rate","wholesale","super_wholesale","discount","qty","image_path","notes"]
+    def _image_file_mtime(self, img):
+        # entries expire so a file edited or replaced outside the app gets a new
+        # thumbnail key; rapid scrolling within the TTL still skips the stat
+        now = time.monotonic()
+        cached = self._image_mtime.get(img)
+        if cached is not None and now - cached[1] < IMAGE_STAT_TTL:
+            return cached[0]
+        try:
+            mtime = os.path.getmtime(img)
+        except OSError:
+            mtime = None
+        self._image_mtime[img] = (mtime, now)
+        return mtime
+
+    def _build_product_form(self, dlg, p=None):
+        # lay the whole form out while the dialog is hidden, then map it once
+        dlg.withdraw()
         entries = {}
-        for i, f in enumerate(fields):
-            tk.Label(dlg, text=f.capitalize()+":").grid(row=i, column=0, sticky="w", padx=6, pady=2)
+        for i, (f, label) in enumerate(PRODUCT_FORM_LABELS):
+            tk.Label(dlg, text=label).grid(row=i, column=0, sticky="w", padx=6, pady=2)
             e = tk.Entry(dlg, width=40)
             e.grid(row=i, column=1, padx=6, pady=2)
+            if p is not None:
+                e.insert(0, str(p.get(f) or ""))
             entries[f] = e
+        dlg.deiconify()
+        return entries
+
+    def open_add_product_dialog(self):
+        # simple dialog form
+        dlg = tk.Toplevel(self.root)
+        dlg.title("Add Product")
+        fields = PRODUCT_COLUMNS
+        entries = self._build_product_form(dlg)
         def on_add():
             p = {k: (entries[k].get().strip() if entries[k].get().strip()!="" else None) for k in fields}
             # convert numeric fields
@@ -1535,8 +2477,9 @@ class BillingApp:
                 messagebox.showerror("Error","Name required")
                 return
             try:
-                save_product_to_db(p)
+                save_product_to_db(p, conn=self.db)
                 self.products[p["name"].lower()] = p
+                self._index_product_add(p["name"].lower())
                 self.refresh_products_view()
                 dlg.destroy()
                 messagebox.showinfo("Added","Product added")
@@ -1550,20 +2493,14 @@ class BillingApp:
             messagebox.showinfo("Edit", "Select a product then press Edit.")
             return
         key = sel[0]
-        p = self.products.get(key.lower()) or self.products.get(key)
+        p = self._product_by_iid(key)
         if not p:
             messagebox.showerror("Error","Product not found")
             return
         dlg = tk.Toplevel(self.root)
         dlg.title("Edit Product")
-        fields = ["sku","name","category","brand","size","color","hsn","mrp","rate","wholesale","super_wholesale","discount","qty","image_path","notes"]
-        entries = {}
-        for i, f in enumerate(fields):
-            tk.Label(dlg, text=f.capitalize()+":").grid(row=i, column=0, sticky="w", padx=6, pady=2)
-            e = tk.Entry(dlg, width=40)
-            e.grid(row=i, column=1, padx=6, pady=2)
-            e.insert(0, str(p.get(f) or ""))
-            entries[f] = e
+        fields = PRODUCT_COLUMNS
+        entries = self._build_product_form(dlg, p)
         def on_save():
             newp = {k: (entries[k].get().strip() if entries[k].get().strip()!="" else None) for k in fields}
             for numf in ("mrp","rate","wholesale","super_wholesale","discount"):
@@ -1579,13 +2516,15 @@ class BillingApp:
                 messagebox.showerror("Error","Name required")
                 return
             try:
-                save_product_to_db(newp)
+                save_product_to_db(newp, conn=self.db)
                 # update in-memory
                 self.products[newp["name"].lower()] = newp
                 # if name changed remove old key
                 if newp["name"].lower() != key.lower() and key.lower() in self.products:
                     try: del self.products[key.lower()]
                     except: pass
+                    self._index_product_remove(key.lower())
+                self._index_product_add(newp["name"].lower())
                 self.refresh_products_view()
                 dlg.destroy()
                 messagebox.showinfo("Saved","Product updated")
@@ -1598,19 +2537,20 @@ class BillingApp:
         if not sel:
             return
         key = sel[0]
-        p = self.products.get(key.lower()) or self.products.get(key)
+        p = self._product_by_iid(key)
         if not p:
             return
         if not messagebox.askyesno("Confirm", f"Delete product '{p.get('name')}'?"):
             return
         try:
-            delete_product_from_db(p.get("name"))
+            delete_product_from_db(p.get("name"), conn=self.db)
         except:
             pass
         try:
             del self.products[p.get("name").lower()]
         except:
             pass
+        self._index_product_remove(p.get("name").lower())
         self.refresh_products_view()
         messagebox.showinfo("Deleted","Product deleted")
 
@@ -1620,7 +2560,7 @@ class BillingApp:
             messagebox.showinfo("Attach Image", "Select a product first")
             return
         key = sel[0]
-        p = self.products.get(key.lower()) or self.products.get(key)
+        p = self._product_by_iid(key)
         if not p:
             return
         fp = filedialog.askopenfilename(filetypes=[("Image files","*.png;*.jpg;*.jpeg;*.gif;*.bmp"),("All files","*.*")])
@@ -1630,10 +2570,22 @@ class BillingApp:
         img_dir = "product_images"
         os.makedirs(img_dir, exist_ok=True)
         dest = os.path.join(img_dir, os.path.basename(fp))
+        # large images are copied off the Tk thread; the product is updated once it lands
+        def task():
+            try:
+                copy_file(fp, dest)
+            except Exception as e:
+                self.root.after(0, lambda err=e: messagebox.showerror("Failed", str(err)))
+                return
+            self.root.after(0, lambda: self._on_image_copied(p, dest))
+        threading.Thread(target=task, daemon=True).start()
+
+    def _on_image_copied(self, p, dest):
         try:
-            shutil.copyfile(fp, dest)
+            # a re-attached file under the same name gets a fresh thumbnail key
+            self._image_mtime[dest] = (os.path.getmtime(dest), time.monotonic())
             p["image_path"] = dest
-            save_product_to_db(p)
+            save_product_to_db(p, conn=self.db)
             self.on_product_select()
             messagebox.showinfo("Image", "Image attached")
         except Exception as e:
@@ -1644,11 +2596,12 @@ class BillingApp:
         if not sel:
             return
         key = sel[0]
-        p = self.products.get(key.lower()) or self.products.get(key)
+        p = self._product_by_iid(key)
         if not p:
             return
+        self._image_mtime.pop(p.get("image_path"), None)
         p["image_path"] = None
-        save_product_to_db(p)
+        save_product_to_db(p, conn=self.db)
         self.on_product_select()
         messagebox.showinfo("Image", "Image cleared")
 
@@ -1657,7 +2610,7 @@ class BillingApp:
         if not sel:
             return
         key = sel[0]
-        p = self.products.get(key.lower()) or self.products.get(key)
+        p = self._product_by_iid(key)
         if not p:
             return
         try:
@@ -1665,7 +2618,7 @@ class BillingApp:
             if newq is None:
                 return
             p["qty"] = int(newq)
-            save_product_to_db(p)
+            save_product_to_db(p, conn=self.db)
             self.refresh_products_view()
             messagebox.showinfo("Qty updated", f"Qty set to {p['qty']}")
         except Exception as e:
@@ -1676,7 +2629,7 @@ class BillingApp:
         if not sel:
             return
         key = sel[0]
-        p = self.products.get(key.lower()) or self.products.get(key)
+        p = self._product_by_iid(key)
         if not p:
             return
         try:
@@ -1684,37 +2637,78 @@ class BillingApp:
             if delta is None:
                 return
             p["qty"] = int((p.get("qty") or 0) + int(delta))
-            save_product_to_db(p)
+            save_product_to_db(p, conn=self.db)
             self.refresh_products_view()
             messagebox.showinfo("Qty updated", f"Qty is now {p['qty']}")
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
+    def apply_inline_qty(self, delta=None):
+        # delta None sets the spinbox value; otherwise nudge the stored qty
+        sel = self.prod_tree.selection()
+        if not sel:
+            return
+        key = sel[0]
+        p = self._product_by_iid(key)
+        if not p:
+            return
+        try:
+            if delta is None:
+                qty = entry_number(self.prod_qty_var, int)
+            else:
+                qty = int(p.get("qty") or 0) + delta
+            p["qty"] = qty
+            save_product_to_db(p, conn=self.db)
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        # patch the visible row and detail field instead of rebuilding the page
+        self.prod_qty_var.set(str(qty))
+        self.prod_tree.set(key, "Qty", qty)
+        ent = self.prod_fields.get("qty")
+        if ent is not None:
+            ent.delete(0, tk.END)
+            ent.insert(0, str(qty))
+
     def bulk_edit_products_csv(self):
         fp = filedialog.askopenfilename(filetypes=[("CSV Files","*.csv")])
         if not fp:
             return
         try:
             count = 0
+            # one read of the master up front and one upsert transaction at the end
+            current = load_products_from_db(conn=self.db)
+            edited = {}
             with open(fp, newline='', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
+                # resolve which editable columns the file has once, from the header
+                cols = reader.fieldnames or ()
+                float_cols = [k for k in ("mrp","rate","wholesale","super_wholesale","discount") if k in cols]
+                text_cols = [k for k in ("category","brand") if k in cols]
+                has_qty = "qty" in cols
                 for r in reader:
                     name = r.get("name") or r.get("Name")
                     if not name:
                         continue
-                    p = load_products_from_db().get(name.lower(), {})
+                    key = name.lower()
+                    p = edited.get(key) or current.get(key, {})
                     # update fields present
-                    for k in ("mrp","rate","wholesale","super_wholesale","discount","qty","category","brand"):
-                        if k in r and r[k]!="":
-                            if k=="qty":
-                                try: p["qty"]=int(float(r[k]))
-                                except: pass
-                            else:
-                                try: p[k]=float(r[k]) if k in ("mrp","rate","wholesale","super_wholesale","discount") else r[k]
-                                except: p[k]=r[k]
+                    for k in float_cols:
+                        v = r[k]
+                        if v!="":
+                            try: p[k]=float(v)
+                            except: p[k]=v
+                    if has_qty and r["qty"]!="":
+                        try: p["qty"]=int(float(r["qty"]))
+                        except: pass
+                    for k in text_cols:
+                        v = r[k]
+                        if v!="":
+                            p[k]=v
                     p["name"]=name
-                    save_product_to_db(p)
+                    edited[key] = p
                     count += 1
+            save_products_to_db(edited.values(), conn=self.db)
             self.reload_products()
             messagebox.showinfo("Bulk edit", f"Processed {count} rows")
         except Exception as e:
@@ -1755,8 +2749,8 @@ class BillingApp:
         if not fp:
             return
         try:
-            import_products_csv(fp)
-            self.products = load_products_from_db()
+            import_products_csv(fp, conn=self.db)
+            self.products = load_products_from_db(conn=self.db)
             self.reload_products()
             messagebox.showinfo("Imported", "Products imported successfully.")
         except Exception as e:
@@ -1774,68 +2768,155 @@ class BillingApp:
             messagebox.showerror("Export failed", str(e))
             logging.exception("Export failed")
 
+# ------------------- Bill PDF -------------------
+def build_bill_pdf(pdf_file, bill):
+    """Write the A4 bill PDF for a bill snapshot (no Tk access; runs on a worker thread)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import Table
+    c = canvas.Canvas(pdf_file, pagesize=A4)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(60, 800, SHOP_NAME)
+    c.setFont("Helvetica", 10)
+    c.drawString(60, 785, SHOP_ADDRESS)
+    c.drawString(60, 770, SHOP_PHONE)
+    c.setFont("Helvetica", 10)
+    c.drawString(400, 740, f"Bill No: {bill['bill_no']}")
+    c.drawString(400, 725, f"Date: {bill['date'].strftime('%d-%m-%Y %H:%M')}")
+    data = [["Item","MRP","Rate","Disc%","Qty","Total"]]
+    for it in bill["items"]:
+        data.append([it["name"], it["mrp"], it["rate"], it["discount"], it["qty"], it["total"]])
+    # fixed column widths and row height keep wrapOn from measuring every cell
+    table = Table(data, colWidths=BILL_TABLE_COL_WIDTHS, rowHeights=BILL_TABLE_ROW_HEIGHT)
+    table.setStyle(get_bill_table_style())
+    table.wrapOn(c, 40, 600)
+    table_h = len(data) * BILL_TABLE_ROW_HEIGHT
+    table.drawOn(c, 40, 600 - table_h)
+    y = 600 - table_h - 20
+    c.drawString(40, y, f"SubTotal: {bill['sub_total']:.2f}")
+    y -= 14
+    c.drawString(40, y, f"GST: {bill['gst']:.2f}")
+    y -= 14
+    c.drawString(40, y, f"Total: {bill['total']:.2f}")
+    c.save()
+
 # ------------------- Additional DB bill save -------------------
-def save_bill_to_db(app, db_file=DB_FILE):
-    conn = sqlite3.connect(db_file)
-    cur = conn.cursor()
-    bill_no, _ = get_next_bill_no()
-    cur.execute("INSERT INTO bills (bill_no, date, customer, phone, subtotal, gst, total, paid, due) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (bill_no, datetime.now().isoformat(), app.cust_name.get(), app.cust_phone.get(), app.sub_total,
-                 round(app.sub_total * app.gst_percent.get() / 100, 2), app.total, app.paid_amount.get(), app.total - app.paid_amount.get()))
-    bill_id = cur.lastrowid
-    for it in app.items_in_bill:
-        cur.execute("INSERT INTO bill_items (bill_id, product_name, mrp, rate, discount, qty, total) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    (bill_id, it["name"], it["mrp"], it["rate"], it["discount"], it["qty"], it["total"]))
-    conn.commit()
-    conn.close()
+def save_bill_to_db(app, db_file=DB_FILE, conn=None, bill_no=None, bill=None):
+    """Store a bill snapshot (app.bill_snapshot()), taking one from app if not given.
+
+    bill_no is the number already assigned to the bill, if any.
+    """
+    if bill is None:
+        if bill_no is None:
+            bill_no, _ = app.current_bill_no()
+        bill = app.bill_snapshot(bill_no)
+    with use_db(conn, db_file) as conn:
+        return _save_bill(conn, bill)
+
+_BILL_INSERT = ("INSERT INTO bills (bill_no, date, customer, phone, subtotal, gst, total, paid, due) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_BILL_ITEM_INSERT = ("INSERT INTO bill_items (bill_id, product_name, mrp, rate, discount, qty, total) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+def _save_bill(conn, bill):
+    # header and items go in one write transaction; the lock is taken up front
+    # use_db rolls back failed blocks, so an open transaction here is someone
+    # else's uncommitted write: refuse rather than discard it
+    if conn.in_transaction:
+        raise sqlite3.ProgrammingError("connection already has an open transaction")
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        cur = conn.cursor()
+        cur.execute(_BILL_INSERT,
+                    (bill["bill_no"], bill["date"].isoformat(), bill["customer"], bill["phone"], bill["sub_total"],
+                     round(bill["gst"], 2), bill["total"], bill["paid"], bill["total"] - bill["paid"]))
+        bill_id = cur.lastrowid
+        cur.executemany(_BILL_ITEM_INSERT,
+                        [(bill_id, it["name"], it["mrp"], it["rate"], it["discount"], it["qty"], it["total"]) for it in bill["items"]])
     return bill_id
 
 # ------------------- Reports -------------------
-def sales_report_by_date(db_file=DB_FILE):
-    conn = sqlite3.connect(db_file)
-    cur = conn.cursor()
-    cur.execute("""
+def sales_report_by_date(db_file=DB_FILE, conn=None):
+    # generator: rows are yielded straight off the cursor (no fetchall); the
+    # connection (and DB_LOCK for the shared one) is held until it is exhausted
+    with use_db(conn, db_file) as conn:
+        yield from conn.execute("""
     SELECT substr(date,1,10) as day, COUNT(*) as bills, SUM(total) as total_amount
     FROM bills
     GROUP BY day
     ORDER BY day DESC
     """)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
 
-def export_sales_report_csv(out_file="sales_by_date.csv", db_file=DB_FILE):
-    rows = sales_report_by_date(db_file=db_file)
+def export_sales_report_csv(out_file="sales_by_date.csv", db_file=DB_FILE, conn=None):
     with open(out_file, "w", newline='', encoding='utf-8') as f:
         w = csv.writer(f)
         w.writerow(["date", "num_bills", "total_amount"])
-        for r in rows:
-            w.writerow(r)
+        w.writerows(sales_report_by_date(db_file=db_file, conn=conn))
     return out_file
 
 # ------------------- Users & Auth (tiny) -------------------
 DEFAULT_USERS = {"admin": {"password": "admin", "role": "admin"}, "cashier": {"password": "cashier", "role": "cashier"}}
-def load_users():
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            pass
+PASSWORD_ITERATIONS = 200_000
+# (mtime of USERS_FILE, parsed users); re-read only when the file changes
+_users_cache = None
+
+def hash_password(password, salt=None, iterations=PASSWORD_ITERATIONS):
+    """Return a 'pbkdf2_sha256$iterations$salt$digest' string for password."""
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+def verify_password(stored, password):
+    try:
+        _, iterations, salt, digest = stored.split("$")
+        check = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt), int(iterations))
+    except:
+        return False
+    return hmac.compare_digest(check.hex(), digest)
+
+def save_users(users):
+    global _users_cache
     with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(DEFAULT_USERS, f, indent=2)
-    return DEFAULT_USERS.copy()
+        json.dump(users, f, indent=2)
+    _users_cache = (os.path.getmtime(USERS_FILE), users)
+
+def load_users():
+    global _users_cache
+    try:
+        mtime = os.path.getmtime(USERS_FILE)
+        if _users_cache is not None and _users_cache[0] == mtime:
+            return _users_cache[1]
+        with open(USERS_FILE, "r", encoding="utf-8") as f:
+            users = json.load(f)
+        _users_cache = (mtime, users)
+        return users
+    except:
+        pass
+    users = {name: {"password_hash": hash_password(u["password"]), "role": u["role"]} for name, u in DEFAULT_USERS.items()}
+    save_users(users)
+    return users
+
 def authenticate(username, password):
     users = load_users()
     u = users.get(username)
     if not u:
         return False, None
-    if u.get("password") == password:
-        return True, u.get("role")
-    return False, None
+    if "password_hash" in u:
+        ok = verify_password(u["password_hash"], password)
+    else:
+        # legacy plaintext entry: check in constant time, then store it hashed
+        ok = hmac.compare_digest(str(u.get("password", "")).encode("utf-8"), password.encode("utf-8"))
+        if ok:
+            u["password_hash"] = hash_password(password)
+            u.pop("password", None)
+            try:
+                save_users(users)
+            except:
+                pass
+    return (True, u.get("role")) if ok else (False, None)
 
 # ------------------- Preferences UI -------------------
-def open_preferences_dialog(parent, settings):
+def open_preferences_dialog(parent, settings, conn=None, on_saved=None):
     win = tk.Toplevel(parent)
     win.title("Preferences")
     win.geometry("420x240")
@@ -1848,14 +2929,42 @@ def open_preferences_dialog(parent, settings):
     tk.Label(win, text="Page size (pagination):").grid(row=2, column=0, sticky="w", padx=8, pady=8)
     page_var = tk.IntVar(value=settings.get("page_size", 200))
     tk.Entry(win, textvariable=page_var, width=8).grid(row=2, column=1, sticky="w")
-    def on_save():
+    raw_var = tk.BooleanVar(value=settings.get("raw_print", False))
+    tk.Checkbutton(win, variable=raw_var, text="Print receipts as raw text (Windows, text/ESC-POS printers)").grid(row=3, column=0, columnspan=2, sticky="w", padx=8)
+    def collect():
         settings["auto_backup"] = ab_var.get()
         settings["auto_backup_interval_minutes"] = int(interval_var.get())
         settings["page_size"] = int(page_var.get())
-        save_settings(settings)
+        settings["raw_print"] = raw_var.get()
+    def on_save():
+        try:
+            collect()
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Invalid value", "Interval and page size must be whole numbers.", parent=win)
+            return
+        try:
+            save_settings(settings, conn=conn)
+        except sqlite3.Error as e:
+            # keep the dialog open so the user can retry
+            logging.exception("Failed to save settings")
+            messagebox.showerror("Save failed", f"Preferences were not saved:\n{e}", parent=win)
+            return
+        if on_saved:
+            on_saved(settings)
         messagebox.showinfo("Saved", "Preferences saved.")
         win.destroy()
-    ttk.Button(win, text="Save", command=on_save).grid(row=6, column=0, columnspan=2, pady=12)
+    def on_export():
+        collect()
+        fp = filedialog.asksaveasfilename(defaultextension=".json", initialfile=SETTINGS_FILE,
+                                          filetypes=[("JSON Files", "*.json")])
+        if fp:
+            try:
+                export_settings(settings, fp)
+                messagebox.showinfo("Exported", f"Settings exported to {fp}")
+            except Exception as e:
+                messagebox.showerror("Export failed", str(e))
+    ttk.Button(win, text="Save", command=on_save).grid(row=6, column=0, pady=12)
+    ttk.Button(win, text="Export...", command=on_export).grid(row=6, column=1, pady=12)
 
 # ------------------- Run App -------------------
 if __name__ == "__main__":